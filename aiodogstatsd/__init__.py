@@ -1,3 +1,4 @@
 from .client import Client
+from .typedefs import MType
 
-__all__ = ("Client",)
+__all__ = ("Client", "MType")
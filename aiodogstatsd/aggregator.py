@@ -0,0 +1,159 @@
+from random import randrange
+from typing import Dict, List, Optional, Tuple
+
+from aiodogstatsd import protocol, typedefs
+
+__all__ = ("Aggregator",)
+
+
+_TContext = Tuple[typedefs.MName, typedefs.MType, str]
+_TSamplesContext = Tuple[typedefs.MName, typedefs.MType, str, typedefs.MSampleRate]
+
+
+class _Samples:
+    __slots__ = ("values", "count")
+
+    def __init__(self) -> None:
+        self.values: List[typedefs.MValue] = []
+        self.count = 0
+
+
+class Aggregator:
+    __slots__ = (
+        "_namespace",
+        "_max_contexts",
+        "_max_samples_per_context",
+        "_max_line_size",
+        "_metrics",
+        "_samples",
+    )
+
+    def __init__(
+        self,
+        *,
+        namespace: Optional[typedefs.MNamespace],
+        max_contexts: int,
+        max_samples_per_context: int,
+        max_line_size: int,
+    ) -> None:
+        """
+        Aggregate metrics between flushes.
+
+        Counters are summed and gauges keep the last value per context, where context
+        is a metric name, type and serialized tags. Histogram, distribution and timing
+        samples are collected per context, no more than `max_samples_per_context`
+        samples are kept using reservoir sampling. No more than `max_contexts`
+        contexts are kept in memory.
+        """
+        self._namespace = namespace
+        self._max_contexts = max_contexts
+        self._max_samples_per_context = max_samples_per_context
+        self._max_line_size = max_line_size
+
+        self._metrics: Dict[_TContext, typedefs.MValue] = {}
+        self._samples: Dict[_TSamplesContext, _Samples] = {}
+
+    def add(
+        self,
+        name: typedefs.MName,
+        type_: typedefs.MType,
+        value: typedefs.MValue,
+        tags: str,
+    ) -> bool:
+        """
+        Aggregate a counter or a gauge value, returns `False` if there is no room for
+        a new context and aggregator must be flushed first.
+        """
+        context = (name, type_, tags)
+
+        if context in self._metrics:
+            if type_ is typedefs.MType.COUNTER:
+                self._metrics[context] += value
+            else:
+                self._metrics[context] = value
+        elif self._has_room():
+            self._metrics[context] = value
+        else:
+            return False
+
+        return True
+
+    def add_sample(
+        self,
+        name: typedefs.MName,
+        type_: typedefs.MType,
+        value: typedefs.MValue,
+        tags: str,
+        sample_rate: typedefs.MSampleRate,
+    ) -> bool:
+        """
+        Collect a histogram, distribution or timing sample, returns `False` if there
+        is no room for a new context and aggregator must be flushed first.
+        """
+        context = (name, type_, tags, sample_rate)
+
+        samples = self._samples.get(context)
+        if samples is None:
+            if not self._has_room():
+                return False
+
+            samples = self._samples[context] = _Samples()
+
+        samples.count += 1
+        if len(samples.values) < self._max_samples_per_context:
+            samples.values.append(value)
+        else:
+            # Reservoir sampling, every sample has the same probability to be kept
+            idx = randrange(samples.count)
+            if idx < self._max_samples_per_context:
+                samples.values[idx] = value
+
+        return True
+
+    def flush(self) -> List[bytes]:
+        """
+        Build metrics for every aggregated context and reset aggregator.
+        """
+        metrics, self._metrics = self._metrics, {}
+        samples, self._samples = self._samples, {}
+
+        flushed = [
+            protocol.build_serialized(
+                name=name,
+                namespace=self._namespace,
+                value=value,
+                type_=type_,
+                tags=tags,
+                sample_rate=1,
+            )
+            for (name, type_, tags), value in metrics.items()
+        ]
+        for (name, type_, tags, sample_rate), context_samples in samples.items():
+            # Values dropped by reservoir are accounted by decreased sample rate
+            flushed.extend(
+                protocol.build_packed(
+                    name=name,
+                    namespace=self._namespace,
+                    values=context_samples.values,
+                    type_=type_,
+                    tags=tags,
+                    sample_rate=(
+                        sample_rate
+                        * len(context_samples.values)
+                        / context_samples.count
+                    ),
+                    max_size=self._max_line_size,
+                )
+            )
+
+        return flushed
+
+    def clear(self) -> None:
+        """
+        Reset aggregator without building metrics.
+        """
+        self._metrics = {}
+        self._samples = {}
+
+    def _has_room(self) -> bool:
+        return len(self._metrics) + len(self._samples) < self._max_contexts
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import FrozenSet, Optional, Set, Tuple
+
+from aiodogstatsd import typedefs
+from aiodogstatsd.telemetry import Telemetry
+
+__all__ = ("OVERFLOW_TAG_VALUE", "CardinalityGuard")
+
+
+OVERFLOW_TAG_VALUE = "_overflow"
+
+_TTagSet = FrozenSet[Tuple[typedefs.MTagKey, typedefs.MTagValue]]
+_TTagsKey = Tuple[Tuple[typedefs.MTagKey, typedefs.MTagValue], ...]
+
+
+class _Contexts:
+    __slots__ = ("tag_sets", "keys")
+
+    def __init__(self) -> None:
+        self.tag_sets: Set[_TTagSet] = set()
+        # Known tag sets in the order they were passed, so known contexts are found
+        # without building a frozen set
+        self.keys: Set[_TTagsKey] = set()
+
+
+class CardinalityGuard:
+    __slots__ = (
+        "_max_contexts_per_metric",
+        "_max_metrics",
+        "_metrics",
+        "_telemetry",
+    )
+
+    def __init__(
+        self,
+        *,
+        max_contexts_per_metric: int,
+        max_metrics: int,
+        telemetry: Telemetry,
+    ) -> None:
+        """
+        Limit the number of unique tag sets per metric name.
+
+        Once a metric has `max_contexts_per_metric` tag sets, all values of a tag set
+        not seen before are replaced with `OVERFLOW_TAG_VALUE`, so a tag with
+        unbounded values, e.g. request ID, collapses into a single context.
+
+        Tag sets are tracked for no more than `max_metrics` metric names, the least
+        recently checked metric is forgotten when a new one comes.
+        """
+        self._max_contexts_per_metric = max_contexts_per_metric
+        self._max_metrics = max_metrics
+        self._metrics: "OrderedDict[typedefs.MName, _Contexts]" = OrderedDict()
+        self._telemetry = telemetry
+
+    def check(
+        self, name: typedefs.MName, tags: typedefs.MTags
+    ) -> Optional[typedefs.MTags]:
+        """
+        Return collapsed tags if any tag value was replaced, otherwise `None`.
+        """
+        metrics = self._metrics
+        contexts = metrics.get(name)
+        if contexts is None:
+            if len(metrics) >= self._max_metrics:
+                metrics.popitem(last=False)
+                self._telemetry.metrics_guard_evicted += 1
+            contexts = metrics[name] = _Contexts()
+        else:
+            metrics.move_to_end(name)
+
+        key = tuple(tags.items())
+        if key in contexts.keys:
+            return None
+
+        tag_sets = contexts.tag_sets
+        tag_set = frozenset(key)
+        if tag_set not in tag_sets:
+            if len(tag_sets) >= self._max_contexts_per_metric:
+                # Any new tag set counts against the limit, even if it's a new
+                # combination of known values, so only keys are kept
+                collapsed = {tag_key: OVERFLOW_TAG_VALUE for tag_key in tags}
+                if collapsed == tags:
+                    return None
+
+                self._telemetry.metrics_tags_collapsed += 1
+                return collapsed
+
+            tag_sets.add(tag_set)
+
+        # Tag set passed in different orders has several keys, so keys are bounded too
+        if len(contexts.keys) < self._max_contexts_per_metric:
+            contexts.keys.add(key)
+        return None
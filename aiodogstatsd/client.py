@@ -1,32 +1,127 @@
 import asyncio
+import functools
+import inspect
+import math
+import os
+import socket
 from asyncio.transports import DatagramTransport
-from contextlib import contextmanager
+from collections import deque
 from random import random
-from typing import Any, Awaitable, Iterator, Optional, TypeVar
+from threading import get_ident
+from time import perf_counter_ns
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+)
+from weakref import WeakSet
 
 from aiodogstatsd import protocol, typedefs
+from aiodogstatsd.aggregator import Aggregator
+from aiodogstatsd.cardinality import CardinalityGuard
+from aiodogstatsd.collectors import Collector
 from aiodogstatsd.compat import get_event_loop
+from aiodogstatsd.monitor import LoopMonitor
+from aiodogstatsd.replay import ReplayBuffer
+from aiodogstatsd.sampling import AdaptiveSampler
+from aiodogstatsd.telemetry import Stats, Telemetry
 
-__all__ = ("Client",)
+__all__ = ("Client", "MetricHandle", "Timer")
 
 _T = TypeVar("_T")
+_TFunc = TypeVar("_TFunc", bound=Callable[..., Any])
+_TThreadedMetric = Tuple[Callable[..., None], Tuple[Any, ...]]
+
+DEFAULT_UDP_MAX_PACKET_SIZE = 1432
+DEFAULT_UDS_MAX_PACKET_SIZE = 8192
+
+_AGGREGATED_TYPES = frozenset((typedefs.MType.COUNTER, typedefs.MType.GAUGE))
+_SAMPLED_TYPES = frozenset(
+    (typedefs.MType.DISTRIBUTION, typedefs.MType.HISTOGRAM, typedefs.MType.TIMING)
+)
+# Gauges aren't scaled by sample rate on the server side, so losing them would
+# only make them stale
+_ADAPTIVE_SAMPLED_TYPES = _SAMPLED_TYPES | {typedefs.MType.COUNTER}
+
+# Minimal delay between attempts to reconnect to the Unix domain socket
+_RECONNECT_INTERVAL = 1.0
+
+# Packets which weren't sent are replayed in batches with this delay between them
+_REPLAY_INTERVAL = 0.01
+# Minimal delay between increases of adaptive sample rate
+_ADAPTIVE_SAMPLING_INTERVAL = 1.0
+
+# Maximal number of buffers passed to `socket.sendmsg`, POSIX minimum is used if
+# the limit is unknown
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    _IOV_MAX = 16
 
 
 class Client:
     __slots__ = (
+        "__weakref__",
         "_host",
         "_port",
+        "_socket_path",
         "_namespace",
         "_constant_tags",
         "_state",
         "_protocol",
         "_pending_queue",
         "_pending_queue_size",
+        "_pending_event",
+        "_loop",
+        "_loop_thread_id",
+        "_threaded_queue",
+        "_threaded_wakeup_scheduled",
         "_listen_future",
         "_listen_future_join",
         "_read_timeout",
         "_close_timeout",
         "_sample_rate",
+        "_sampler",
+        "_adaptive_rate",
+        "_guard",
+        "_builder",
+        "_buffered",
+        "_scatter_gather",
+        "_direct_send",
+        "_buffer",
+        "_buffer_size",
+        "_buffer_flush_at",
+        "_max_packet_size",
+        "_flush_interval",
+        "_reconnect_at",
+        "_aggregator",
+        "_aggregated_types",
+        "_aggregation_interval",
+        "_aggregation_flush_at",
+        "_pending_since",
+        "_telemetry",
+        "_telemetry_interval",
+        "_telemetry_flush_at",
+        "_loop_monitor",
+        "_collectors",
+        "_collect_interval",
+        "_collect_at",
+        "_replay_buffer",
+        "_replay_buffer_size",
+        "_replay_buffer_path",
+        "_replay_rate",
+        "_replay_at",
+        "_unavailable",
+        "_probing",
     )
 
     @property
@@ -46,34 +141,111 @@ class Client:
         *,
         host: str = "localhost",
         port: int = 9125,
+        socket_path: Optional[str] = None,
         namespace: Optional[typedefs.MNamespace] = None,
         constant_tags: Optional[typedefs.MTags] = None,
         read_timeout: float = 0.5,
         close_timeout: Optional[float] = None,
         sample_rate: typedefs.MSampleRate = 1,
         pending_queue_size: int = 2 ** 16,
+        buffered: bool = False,
+        max_packet_size: Optional[int] = None,
+        flush_interval: float = 0.1,
+        scatter_gather: bool = False,
+        direct_send: bool = False,
+        aggregate: bool = False,
+        aggregation_interval: float = 2.0,
+        max_aggregation_contexts: int = 2 ** 14,
+        extended_aggregation: bool = False,
+        max_samples_per_context: int = 2 ** 10,
+        header_cache_size: int = 2 ** 10,
+        telemetry_interval: Optional[float] = None,
+        adaptive_sampling: bool = False,
+        adaptive_sampling_threshold: float = 0.25,
+        adaptive_sampling_min_rate: float = 0.01,
+        max_contexts_per_metric: Optional[int] = None,
+        max_guarded_metrics: int = 2 ** 10,
+        loop_monitor_interval: Optional[float] = None,
+        slow_callback_threshold: float = 0.1,
+        collectors: Sequence[Collector] = (),
+        collect_interval: float = 10.0,
+        replay_buffer_size: Optional[int] = None,
+        replay_buffer_path: Optional[str] = None,
+        replay_rate: int = 1000,
     ) -> None:
         """
         Initialize a client object.
 
         You can pass `host` and `port` of the DogStatsD server, `namespace` to prefix
-        all metric names, `constant_tags` to attach to all metrics.
+        all metric names, `constant_tags` to attach to all metrics. Pass `socket_path`
+        to send metrics over the Unix domain socket instead of UDP, in that case the
+        client reconnects automatically if the socket was recreated by the server.
 
         Also, you can specify: `read_timeout` which will be used to read messages from
         an AsyncIO queue; `close_timeout` which will be used as wait time for client
-        closing; `sample_rate` can be used for adjusting the frequency of stats sending.
+        closing; `sample_rate` can be used for adjusting the frequency of stats sending;
+        `header_cache_size` limits the number of cached serialized metric headers;
+        `telemetry_interval` enables sending of client's own metrics;
+        `max_contexts_per_metric` limits the number of unique tag sets per metric
+        name, tag sets seen after the limit is reached are collapsed, tag sets are
+        tracked for up to `max_guarded_metrics` recently used metric names;
+        `loop_monitor_interval` enables monitoring of the event loop lag, the number
+        of tasks and probes delayed by more than `slow_callback_threshold`
+        seconds; `collectors` are called every `collect_interval` seconds to send
+        metrics they collected, e.g. `aiodogstatsd.collectors.RuntimeCollector`.
+
+        With `buffered` enabled, enqueued metrics are packed into datagrams of up to
+        `max_packet_size` bytes, a partially filled datagram is sent after
+        `flush_interval` seconds. With `scatter_gather` enabled, metrics are passed
+        to `socket.sendmsg` as is and joined into a datagram by the kernel.
+
+        With `direct_send` enabled and `buffered` disabled, metrics are sent to the
+        socket right away by the caller, they are enqueued only if the socket isn't
+        writable.
+
+        With `aggregate` enabled, counters and gauges are aggregated per context and
+        sent every `aggregation_interval` seconds, no more than
+        `max_aggregation_contexts` contexts are kept between flushes. With
+        `extended_aggregation` enabled, histogram, distribution and timing samples are
+        collected per context and sent packed together, no more than
+        `max_samples_per_context` samples per context are kept using reservoir
+        sampling.
+
+        With `adaptive_sampling` enabled, counters, histograms, distributions and
+        timings are sampled more when the pending queue fill level between sends
+        exceeds `adaptive_sampling_threshold` of `pending_queue_size`, sample rate
+        is multiplied by a factor not lower than `adaptive_sampling_min_rate` and
+        raised back as the pressure falls.
+
+        With `replay_buffer_size` set, packets which weren't sent are kept in a ring
+        buffer of that many bytes, the oldest packets are dropped when it's full. While
+        sending fails new packets are kept as well and the server is probed with a
+        single packet right away and then every second. Once the server accepts it, new
+        packets are sent right away and kept packets are sent along with them at
+        `replay_rate` packets per second. With `replay_buffer_path` set, the buffer is
+        kept in a memory-mapped file, so packets which weren't sent before the client
+        was closed are sent by the next client using the same file.
         """
         self._host = host
         self._port = port
+        self._socket_path = socket_path
         self._namespace = namespace
         self._constant_tags = constant_tags or {}
 
         self._state = typedefs.CState.DISCONNECTED
 
-        self._protocol = DatagramProtocol()
+        self._scatter_gather = scatter_gather
+        self._direct_send = direct_send and not buffered
+        self._protocol = self._create_protocol()
 
-        self._pending_queue: asyncio.Queue
+        self._pending_queue: Deque[bytes] = deque()
         self._pending_queue_size = pending_queue_size
+        self._pending_event: asyncio.Event
+
+        self._loop: asyncio.AbstractEventLoop
+        self._loop_thread_id = 0
+        self._threaded_queue: Deque[_TThreadedMetric] = deque()
+        self._threaded_wakeup_scheduled = False
 
         self._listen_future: asyncio.Future
         self._listen_future_join: asyncio.Future
@@ -82,6 +254,93 @@ class Client:
         self._close_timeout = close_timeout
         self._sample_rate = sample_rate
 
+        self._sampler = (
+            AdaptiveSampler(
+                threshold=adaptive_sampling_threshold,
+                min_rate=adaptive_sampling_min_rate,
+                interval=_ADAPTIVE_SAMPLING_INTERVAL,
+            )
+            if adaptive_sampling
+            else None
+        )
+        self._adaptive_rate = 1.0
+
+        self._telemetry = Telemetry()
+        self._telemetry_interval = telemetry_interval
+        self._telemetry_flush_at = 0.0
+
+        self._guard = (
+            CardinalityGuard(
+                max_contexts_per_metric=max_contexts_per_metric,
+                max_metrics=max_guarded_metrics,
+                telemetry=self._telemetry,
+            )
+            if max_contexts_per_metric is not None
+            else None
+        )
+        self._builder = protocol.Builder(
+            namespace=namespace,
+            constant_tags=self._constant_tags,
+            cache_size=header_cache_size,
+            guard=self._guard,
+        )
+
+        self._buffered = buffered
+        self._buffer: List[bytes] = []
+        self._buffer_size = 0
+        self._buffer_flush_at = 0.0
+        self._max_packet_size = max_packet_size or (
+            DEFAULT_UDP_MAX_PACKET_SIZE
+            if socket_path is None
+            else DEFAULT_UDS_MAX_PACKET_SIZE
+        )
+        self._flush_interval = flush_interval
+
+        self._reconnect_at = 0.0
+
+        self._aggregated_types: FrozenSet[typedefs.MType] = frozenset()
+        if aggregate:
+            self._aggregated_types |= _AGGREGATED_TYPES
+        if extended_aggregation:
+            self._aggregated_types |= _SAMPLED_TYPES
+
+        self._aggregator = (
+            Aggregator(
+                namespace=namespace,
+                max_contexts=max_aggregation_contexts,
+                max_samples_per_context=max_samples_per_context,
+                max_line_size=self._max_packet_size,
+            )
+            if self._aggregated_types
+            else None
+        )
+        self._aggregation_interval = aggregation_interval
+        self._aggregation_flush_at = 0.0
+
+        self._pending_since = 0.0
+
+        self._loop_monitor = (
+            LoopMonitor(
+                self,
+                interval=loop_monitor_interval,
+                slow_callback_threshold=slow_callback_threshold,
+            )
+            if loop_monitor_interval is not None
+            else None
+        )
+
+        self._collectors = tuple(collectors)
+        self._collect_interval = collect_interval
+        self._collect_at = 0.0
+
+        self._replay_buffer: Optional[ReplayBuffer] = None
+        self._replay_buffer_size = replay_buffer_size
+        self._replay_buffer_path = replay_buffer_path
+        self._replay_rate = replay_rate
+        self._replay_at = 0.0
+        self._unavailable = False
+        self._probing = False
+
     async def __aenter__(self) -> "Client":
         await self.connect()
         return self
@@ -90,33 +349,189 @@ class Client:
         await self.close()
 
     async def connect(self) -> None:
-        loop = get_event_loop()
-        await loop.create_datagram_endpoint(
-            lambda: self._protocol, remote_addr=(self._host, self._port)
-        )
+        await self._create_endpoint(self._protocol)
+
+        if self._replay_buffer_size is not None and self._replay_buffer is None:
+            self._replay_buffer = ReplayBuffer(
+                max_size=self._replay_buffer_size, path=self._replay_buffer_path
+            )
+
+        self._start()
+
+    def _start(self) -> None:
+        self._pending_queue = deque()
+        self._pending_event = asyncio.Event()
+
+        self._loop = get_event_loop()
+        self._loop_thread_id = get_ident()
+        self._threaded_queue = deque()
+        self._threaded_wakeup_scheduled = False
 
-        self._pending_queue = asyncio.Queue(maxsize=self._pending_queue_size)
         self._listen_future = asyncio.ensure_future(self._listen())
         self._listen_future_join = asyncio.Future()
 
+        self._aggregation_flush_at = (
+            get_event_loop().time() + self._aggregation_interval
+        )
+        if self._telemetry_interval is not None:
+            self._telemetry_flush_at = (
+                get_event_loop().time() + self._telemetry_interval
+            )
+
         self._state = typedefs.CState.CONNECTED
 
+        if self._loop_monitor is not None:
+            self._loop_monitor.start()
+        if self._collectors:
+            self._collect_at = get_event_loop().time() + self._collect_interval
+            for collector in self._collectors:
+                collector.start()
+
+        _clients.add(self)
+
     async def close(self) -> None:
+        if self._state == typedefs.CState.FORKED:
+            # Client was inherited from the parent process and never used after fork
+            self._state = typedefs.CState.DISCONNECTED
+            return
+
         self._state = typedefs.CState.CLOSING
 
+        if self._loop_monitor is not None:
+            self._loop_monitor.stop()
+        for collector in self._collectors:
+            collector.stop()
+
         try:
             await asyncio.wait_for(self._close(), timeout=self._close_timeout)
         except asyncio.TimeoutError:
             pass
 
+        if self._replay_buffer is not None:
+            self._replay_buffer.close()
+            self._replay_buffer = None
+
         self._state = typedefs.CState.DISCONNECTED
 
+        _clients.discard(self)
+
+    def _create_protocol(self) -> "DatagramProtocol":
+        return DatagramProtocol(
+            scatter_gather=self._scatter_gather, direct_send=self._direct_send
+        )
+
+    async def _create_endpoint(self, protocol: "DatagramProtocol") -> None:
+        loop = get_event_loop()
+        if self._socket_path is not None:
+            await loop.create_datagram_endpoint(
+                lambda: protocol, remote_addr=self._socket_path, family=socket.AF_UNIX
+            )
+        else:
+            await loop.create_datagram_endpoint(
+                lambda: protocol, remote_addr=(self._host, self._port)
+            )
+
+    async def _reconnect(self) -> None:
+        loop = get_event_loop()
+        if loop.time() < self._reconnect_at:
+            return
+
+        self._reconnect_at = loop.time() + _RECONNECT_INTERVAL
+
+        await self._protocol.close()
+
+        protocol = self._create_protocol()
+        try:
+            await self._create_endpoint(protocol)
+        except OSError:
+            # Server is still unavailable, try again later
+            return
+
+        self._protocol = protocol
+
+    def _reset_after_fork(self) -> None:
+        # Counters of the parent process are reported by it, so the child process
+        # counts only its own metrics
+        self._telemetry.reset()
+        for collector in self._collectors:
+            collector.reset()
+
+        if self._state != typedefs.CState.CONNECTED:
+            self._state = typedefs.CState.DISCONNECTED
+            return
+
+        # Everything enqueued belongs to the parent process and will be sent by it.
+        # Inherited transport and futures are bound to the parent's event loop, so
+        # they are just dropped.
+        self._state = typedefs.CState.FORKED
+        self._protocol = self._create_protocol()
+        self._pending_queue = deque()
+        self._threaded_queue = deque()
+        self._buffer = []
+        self._buffer_size = 0
+        if self._aggregator is not None:
+            self._aggregator.clear()
+        if self._loop_monitor is not None:
+            self._loop_monitor.reset()
+        # File backed buffer is shared with the parent process, so the child process
+        # keeps its packets in memory and drains them on closing
+        if self._replay_buffer is not None:
+            self._replay_buffer = ReplayBuffer(
+                max_size=cast(int, self._replay_buffer_size)
+            )
+            self._replay_buffer_path = None
+            self._unavailable = False
+            self._probing = False
+
+    def _reconnect_if_forked(self) -> bool:
+        if self._state != typedefs.CState.FORKED:
+            return False
+
+        try:
+            get_event_loop()
+        except RuntimeError:
+            # There is no running event loop, so there is no way to send metrics
+            return False
+
+        self._start()
+
+        return True
+
     async def _close(self) -> None:
         await self._listen_future_join
         self._listen_future.cancel()
 
         await self._protocol.close()
 
+    def stats(self) -> Stats:
+        """
+        Return a snapshot of client's own counters: enqueued and dropped metrics,
+        sent packets and bytes, pending queue high-water mark and time in seconds
+        metrics spend in the pending queue.
+        """
+        return self._telemetry.stats()
+
+    def header_cache_info(self) -> protocol.CacheInfo:
+        """
+        Return statistics of serialized metric headers cache.
+        """
+        return self._builder.cache_info()
+
+    def handle(
+        self,
+        name: typedefs.MName,
+        *,
+        tags: Optional[typedefs.MTags] = None,
+        sample_rate: Optional[typedefs.MSampleRate] = None,
+    ) -> "MetricHandle":
+        """
+        Create a handle to send metrics with a fixed name, tags and sample rate,
+        optionally setting tags and a sample rate.
+        """
+        return MetricHandle(
+            self, name, tags=tags, sample_rate=sample_rate or self._sample_rate
+        )
+
     def gauge(
         self,
         name: typedefs.MName,
@@ -196,26 +611,331 @@ class Client:
         """
         self._report(name, typedefs.MType.TIMING, value, tags, sample_rate)
 
+    def submit_many(
+        self,
+        name: typedefs.MName,
+        values: Iterable[typedefs.MValue],
+        *,
+        type_: typedefs.MType,
+        tags: Optional[typedefs.MTags] = None,
+        sample_rate: Optional[typedefs.MSampleRate] = None,
+    ) -> None:
+        """
+        Send many values of the same metric at once, optionally setting tags and a
+        sample rate. Values can be any iterable or a one-dimensional object supporting
+        buffer protocol, e.g. `array.array` or NumPy array.
+
+        Histogram, distribution and timing values are packed into as few lines as
+        possible, counter values are summed and only the last gauge value is sent.
+        """
+        # Values are copied, so the caller can reuse the container right away
+        values = _to_list(values)
+
+        if self._state != typedefs.CState.CONNECTED and not self._reconnect_if_forked():
+            self._telemetry.metrics_dropped_closing += len(values)
+            return
+
+        if get_ident() != self._loop_thread_id:
+            self._report_threadsafe(
+                self._process_many, (name, type_, values, tags, sample_rate)
+            )
+            return
+
+        self._process_many(name, type_, values, tags, sample_rate)
+
     async def _listen(self) -> None:
+        if not self._protocol.connected:
+            # Client was connected lazily after fork, metrics enqueued in the meantime
+            # are kept until connection is established
+            try:
+                await self._create_endpoint(self._protocol)
+            except OSError:
+                pass
+
         try:
             while self.connected:
                 await self._listen_and_send()
+
+                if (
+                    self._aggregator is not None
+                    and get_event_loop().time() >= self._aggregation_flush_at
+                ):
+                    self._flush_aggregator()
+
+                if (
+                    self._telemetry_interval is not None
+                    and get_event_loop().time() >= self._telemetry_flush_at
+                ):
+                    self._flush_telemetry()
+
+                if self._collectors and get_event_loop().time() >= self._collect_at:
+                    self._collect()
+
+                # Server is probed until it's back even if there is nothing to replay
+                if (
+                    self._replay_buffer is not None
+                    and (len(self._replay_buffer) or self._unavailable)
+                    and get_event_loop().time() >= self._replay_at
+                ):
+                    self._replay(max(int(self._replay_rate * _REPLAY_INTERVAL), 1))
+
+                # Unix domain socket stays connected to the removed socket file after
+                # server restart, so we need to connect to the new one
+                if self._socket_path is not None and self._protocol.failed:
+                    await self._reconnect()
         finally:
             # Note that `asyncio.CancelledError` raised on app clean up
-            # Try to send remaining enqueued metrics if any
-            while not self._pending_queue.empty():
-                await self._listen_and_send()
+            # Try to send remaining aggregated and enqueued metrics if any
+            self._process_threaded()
+            if self._aggregator is not None:
+                self._flush_aggregator()
+            if self._telemetry_interval is not None:
+                self._flush_telemetry()
+            self._send_pending()
+            self._flush_buffer()
+            # Packets kept in memory would be lost, so they are sent without probing
+            # and pacing, file backed buffer keeps them for the next client
+            if self._replay_buffer is not None and self._replay_buffer_path is None:
+                self._replay(len(self._replay_buffer), probe=False)
             self._listen_future_join.set_result(True)
 
     async def _listen_and_send(self) -> None:
-        coro = self._pending_queue.get()
+        loop = get_event_loop()
 
-        try:
-            buf = await asyncio.wait_for(coro, timeout=self._read_timeout)
-        except asyncio.TimeoutError:
-            pass
+        # Wait for the first enqueued metric, then everything enqueued in the meantime
+        # is sent at once, so there is no waiting per metric
+        if not self._pending_queue:
+            # Don't wait longer than needed to flush a partially filled datagram or
+            # aggregated metrics
+            timeout = self._read_timeout
+            if self._buffer:
+                timeout = min(timeout, self._buffer_flush_at - loop.time())
+            if self._aggregator is not None:
+                timeout = min(timeout, self._aggregation_flush_at - loop.time())
+            if self._telemetry_interval is not None:
+                timeout = min(timeout, self._telemetry_flush_at - loop.time())
+            if self._collectors:
+                timeout = min(timeout, self._collect_at - loop.time())
+            if self._replay_buffer is not None and (
+                len(self._replay_buffer) or self._unavailable
+            ):
+                timeout = min(timeout, self._replay_at - loop.time())
+            timeout = max(timeout, 0)
+
+            self._pending_event.clear()
+            try:
+                await asyncio.wait_for(self._pending_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        self._send_pending()
+
+        if self._buffer and loop.time() >= self._buffer_flush_at:
+            self._flush_buffer()
+
+    def _send_pending(self) -> None:
+        pending_queue = self._pending_queue
+        if not pending_queue:
+            return
+
+        # Pending queue is only drained here, so its size is the largest one since
+        # the previous drain
+        now = self._loop.time()
+        self._telemetry.observe_pending_queue_size(len(pending_queue))
+        self._telemetry.observe_send_latency(now - self._pending_since)
+
+        if self._sampler is not None:
+            self._sampler.observe(len(pending_queue) / self._pending_queue_size, now)
+            self._adaptive_rate = self._sampler.rate
+
+        if not self._buffered:
+            send = self._send_packet
+            while pending_queue:
+                send(pending_queue.popleft(), 1)
         else:
-            self._protocol.send(buf)
+            while pending_queue:
+                self._buffer_metric(pending_queue.popleft())
+
+    def _send_packet(self, packet: bytes, metrics: int) -> None:
+        if self._server_unavailable():
+            self._keep_for_replay(packet)
+            return
+
+        telemetry = self._telemetry
+        if self._protocol.send(packet):
+            telemetry.packets_sent += 1
+            telemetry.bytes_sent += len(packet)
+        elif self._replay_buffer is not None:
+            self._keep_for_replay(packet)
+        else:
+            telemetry.packets_dropped += 1
+            telemetry.metrics_dropped_send_error += metrics
+
+    def _server_unavailable(self) -> bool:
+        # Send errors over UDP are reported after the datagram was sent, so the server
+        # is unavailable since the error is reported until it accepts a probe packet
+        return self._replay_buffer is not None and (
+            self._unavailable or self._protocol.send_failed
+        )
+
+    def _keep_for_replay(self, packet: bytes) -> None:
+        assert self._replay_buffer is not None
+
+        if not self._unavailable:
+            self._unavailable = True
+            self._probing = False
+            self._replay_at = get_event_loop().time() + _REPLAY_INTERVAL
+
+        # Only packets dropped from the buffer are lost, the number of metrics in them
+        # isn't known
+        dropped = self._replay_buffer.dropped
+        self._replay_buffer.push(packet)
+        self._telemetry.packets_dropped += self._replay_buffer.dropped - dropped
+
+    def _replay(self, count: int, *, probe: bool = True) -> None:
+        assert self._replay_buffer is not None
+
+        replay_buffer, telemetry = self._replay_buffer, self._telemetry
+        now = get_event_loop().time()
+
+        if probe and self._protocol.send_failed:
+            # Error was reported after the last packet was sent
+            self._unavailable = True
+        if probe and self._unavailable:
+            if not self._probing:
+                # A single packet is sent to probe the server
+                count = 1
+            elif self._protocol.send_failed:
+                # Probe packet was refused, so the server is probed again later
+                self._probing = False
+                self._replay_at = now + _RECONNECT_INTERVAL
+                return
+            else:
+                # No error was reported since the probe packet, so the server is back
+                self._unavailable = self._probing = False
+
+        sent = 0
+        for _ in range(count):
+            packet = replay_buffer.peek()
+            if packet is None:
+                break
+
+            if not self._protocol.send(packet):
+                # Server is still unavailable, try again later
+                self._unavailable = True
+                self._replay_at = now + _RECONNECT_INTERVAL
+                return
+
+            replay_buffer.pop()
+            telemetry.packets_sent += 1
+            telemetry.bytes_sent += len(packet)
+            sent += 1
+
+        if self._unavailable:
+            # Error is reported shortly after the probe packet was sent, without a
+            # probe packet the server is probed again later
+            self._probing = sent > 0
+            self._replay_at = now + (
+                _REPLAY_INTERVAL if self._probing else _RECONNECT_INTERVAL
+            )
+        else:
+            self._replay_at = now + _REPLAY_INTERVAL
+
+    def _flush_telemetry(self) -> None:
+        assert self._telemetry_interval is not None
+
+        self._telemetry_flush_at = get_event_loop().time() + self._telemetry_interval
+
+        # Telemetry is sent as is, without namespace, aggregation and sampling
+        for name, type_, value, tags in self._telemetry.flush():
+            self._enqueue(
+                protocol.build(
+                    name=name,
+                    namespace=None,
+                    value=value,
+                    type_=type_,
+                    tags=dict(self._constant_tags, **tags),
+                    sample_rate=1,
+                )
+            )
+
+    def _collect(self) -> None:
+        self._collect_at = get_event_loop().time() + self._collect_interval
+
+        for collector in self._collectors:
+            try:
+                metrics = collector.collect()
+            except Exception:
+                # Errors should fail silently so they don't affect anything else
+                continue
+
+            for metric in metrics:
+                self._process_many(
+                    metric.name, metric.type_, list(metric.values), metric.tags, None
+                )
+
+    def _aggregate(
+        self,
+        name: typedefs.MName,
+        type_: typedefs.MType,
+        value: typedefs.MValue,
+        serialized_tags: str,
+        sample_rate: typedefs.MSampleRate = 1,
+    ) -> None:
+        assert self._aggregator is not None
+
+        if type_ in _AGGREGATED_TYPES:
+            if not self._aggregator.add(name, type_, value, serialized_tags):
+                self._flush_aggregator()
+                self._aggregator.add(name, type_, value, serialized_tags)
+        elif not self._aggregator.add_sample(
+            name, type_, value, serialized_tags, sample_rate
+        ):
+            self._flush_aggregator()
+            self._aggregator.add_sample(
+                name, type_, value, serialized_tags, sample_rate
+            )
+
+    def _flush_aggregator(self) -> None:
+        assert self._aggregator is not None
+
+        self._aggregation_flush_at = (
+            get_event_loop().time() + self._aggregation_interval
+        )
+
+        for metric in self._aggregator.flush():
+            self._enqueue(metric)
+
+    def _buffer_metric(self, buf: bytes) -> None:
+        if self._buffer and (self._buffer_size + len(buf) + 1 > self._max_packet_size):
+            self._flush_buffer()
+
+        if not self._buffer:
+            self._buffer_flush_at = get_event_loop().time() + self._flush_interval
+            self._buffer_size = len(buf)
+        else:
+            self._buffer_size += len(buf) + 1
+
+        self._buffer.append(buf)
+
+    def _flush_buffer(self) -> None:
+        if not self._buffer:
+            return
+
+        telemetry = self._telemetry
+        if self._server_unavailable():
+            self._keep_for_replay(b"\n".join(self._buffer))
+        elif self._protocol.send_lines(self._buffer):
+            telemetry.packets_sent += 1
+            telemetry.bytes_sent += self._buffer_size
+        elif self._replay_buffer is not None:
+            self._keep_for_replay(b"\n".join(self._buffer))
+        else:
+            telemetry.packets_dropped += 1
+            telemetry.metrics_dropped_send_error += len(self._buffer)
+
+        self._buffer.clear()
+        self._buffer_size = 0
 
     def _report(
         self,
@@ -226,33 +946,153 @@ class Client:
         sample_rate: Optional[typedefs.MSampleRate] = None,
     ) -> None:
         # Ignore any new incoming metric if client in closing or disconnected state
-        if self.closing or self.disconnected:
+        if self._state != typedefs.CState.CONNECTED and not self._reconnect_if_forked():
+            self._telemetry.metrics_dropped_closing += 1
+            return
+
+        if get_ident() != self._loop_thread_id:
+            self._report_threadsafe(
+                self._process, (name, type_, value, tags, sample_rate)
+            )
+            return
+
+        self._process(name, type_, value, tags, sample_rate)
+
+    def _process(
+        self,
+        name: typedefs.MName,
+        type_: typedefs.MType,
+        value: typedefs.MValue,
+        tags: Optional[typedefs.MTags],
+        sample_rate: Optional[typedefs.MSampleRate],
+    ) -> None:
+        aggregated = type_ in self._aggregated_types
+        if aggregated and self._guard is not None:
+            # Aggregated metrics don't use cached headers, so tags are checked here
+            tags = self._builder.guard_tags(name, tags)
+
+        # Aggregated counters and gauges are sent once per context, so sampling isn't
+        # needed
+        if aggregated and type_ in _AGGREGATED_TYPES:
+            self._aggregate(name, type_, value, self._builder.build_tags(tags))
             return
 
         sample_rate = sample_rate or self._sample_rate
+        if self._adaptive_rate != 1 and type_ in _ADAPTIVE_SAMPLED_TYPES:
+            sample_rate = _adapt(sample_rate, self._adaptive_rate)
         if sample_rate != 1 and random() > sample_rate:
             return
 
-        # Resolve full tags list
-        all_tags = dict(self._constant_tags, **tags or {})
+        if aggregated:
+            self._aggregate(
+                name, type_, value, self._builder.build_tags(tags), sample_rate
+            )
+            return
 
-        # Build metric
-        metric = protocol.build(
+        # Build metric, header with resolved full tags list is cached
+        metric = self._builder.build(
             name=name,
-            namespace=self._namespace,
             value=value,
             type_=type_,
-            tags=all_tags,
+            tags=tags,
             sample_rate=sample_rate,
         )
 
-        # Enqueue metric
-        try:
-            self._pending_queue.put_nowait(metric)
-        except asyncio.QueueFull:
-            pass
+        self._enqueue(metric)
+
+    def _process_many(
+        self,
+        name: typedefs.MName,
+        type_: typedefs.MType,
+        values: List[typedefs.MValue],
+        tags: Optional[typedefs.MTags],
+        sample_rate: Optional[typedefs.MSampleRate],
+    ) -> None:
+        if not values:
+            return
+
+        if type_ in _AGGREGATED_TYPES:
+            value = sum(values) if type_ is typedefs.MType.COUNTER else values[-1]
+            self._process(name, type_, value, tags, sample_rate)
+            return
+
+        sample_rate = sample_rate or self._sample_rate
+        if self._adaptive_rate != 1:
+            sample_rate = _adapt(sample_rate, self._adaptive_rate)
+        if sample_rate != 1:
+            values = _sample(values, sample_rate)
+
+        if type_ in self._aggregated_types:
+            serialized_tags = self._builder.build_tags(
+                self._builder.guard_tags(name, tags)
+            )
+            for value in values:
+                self._aggregate(name, type_, value, serialized_tags, sample_rate)
+            return
+
+        for metric in self._builder.build_packed(
+            name=name,
+            values=values,
+            type_=type_,
+            tags=tags,
+            sample_rate=sample_rate,
+            max_size=self._max_packet_size,
+        ):
+            self._enqueue(metric)
+
+    def _report_threadsafe(
+        self, process: Callable[..., None], args: Tuple[Any, ...]
+    ) -> None:
+        # Metrics reported from other threads are processed in the event loop thread
+        # in batches, only the first metric of a batch wakes the event loop up.
+        # Appending to a deque is thread-safe.
+        threaded_queue = self._threaded_queue
+        if len(threaded_queue) >= self._pending_queue_size:
+            self._telemetry.metrics_dropped_queue_full += 1
+            return
+
+        threaded_queue.append((process, args))
+
+        if not self._threaded_wakeup_scheduled:
+            self._threaded_wakeup_scheduled = True
+            try:
+                self._loop.call_soon_threadsafe(self._process_threaded)
+            except RuntimeError:
+                # Event loop is closed
+                pass
+
+    def _process_threaded(self) -> None:
+        # Reset the flag before processing, so a metric appended after that schedules
+        # another wakeup
+        self._threaded_wakeup_scheduled = False
+
+        threaded_queue = self._threaded_queue
+        while threaded_queue:
+            process, args = threaded_queue.popleft()
+            process(*args)
+
+    def _enqueue(self, metric: bytes) -> None:
+        pending_queue = self._pending_queue
+
+        # Enqueued metrics must be sent first to keep the order, metrics are kept for
+        # replay while the server is unavailable
+        if self._direct_send and not pending_queue and not self._server_unavailable():
+            if self._protocol.send_direct(metric):
+                self._telemetry.packets_sent += 1
+                self._telemetry.bytes_sent += len(metric)
+                return
+        if len(pending_queue) >= self._pending_queue_size:
+            self._telemetry.metrics_dropped_queue_full += 1
+            return
+
+        pending_queue.append(metric)
+        self._telemetry.metrics_enqueued += 1
+
+        # Only the first metric wakes the listener up, the rest is sent with it
+        if len(pending_queue) == 1:
+            self._pending_since = self._loop.time()
+            self._pending_event.set()
 
-    @contextmanager
     def timeit(
         self,
         name: typedefs.MName,
@@ -260,19 +1100,30 @@ class Client:
         tags: Optional[typedefs.MTags] = None,
         sample_rate: Optional[typedefs.MSampleRate] = None,
         threshold_ms: Optional[typedefs.MValue] = None,
-    ) -> Iterator[None]:
+    ) -> "Timer":
         """
-        Context manager for easily timing methods.
+        Context manager for easily timing methods, can be used as a sync or an async
+        context manager.
         """
-        loop = get_event_loop()
-        started_at = loop.time()
+        return Timer(
+            self, name, tags=tags, sample_rate=sample_rate, threshold_ms=threshold_ms
+        )
 
-        try:
-            yield
-        finally:
-            value = (loop.time() - started_at) * 1000
-            if not threshold_ms or value > threshold_ms:
-                self.timing(name, value=int(value), tags=tags, sample_rate=sample_rate)
+    def timed(
+        self,
+        name: typedefs.MName,
+        *,
+        tags: Optional[typedefs.MTags] = None,
+        sample_rate: Optional[typedefs.MSampleRate] = None,
+        threshold_ms: Optional[typedefs.MValue] = None,
+    ) -> "Timer":
+        """
+        Decorator for timing functions, coroutine functions, generator functions and
+        async generator functions.
+        """
+        return Timer(
+            self, name, tags=tags, sample_rate=sample_rate, threshold_ms=threshold_ms
+        )
 
     def timeit_task(
         self,
@@ -288,25 +1139,341 @@ class Client:
         done and if exceeds threshold.
         """
         loop = get_event_loop()
-        started_at = loop.time()
+        started_at = perf_counter_ns()
 
         def _callback(_: Any) -> None:
-            duration = (loop.time() - started_at) * 1000
+            duration = _elapsed_ms(started_at)
             if threshold_ms and duration < threshold_ms:
                 return
-            self.timing(name, value=int(duration), tags=tags, sample_rate=sample_rate)
+            self.timing(name, value=duration, tags=tags, sample_rate=sample_rate)
 
         task = loop.create_task(coro)
         task.add_done_callback(_callback)
         return task
 
 
+class Timer:
+    __slots__ = (
+        "_client",
+        "_name",
+        "_tags",
+        "_sample_rate",
+        "_threshold_ms",
+        "_started_at",
+    )
+
+    def __init__(
+        self,
+        client: Client,
+        name: typedefs.MName,
+        *,
+        tags: Optional[typedefs.MTags],
+        sample_rate: Optional[typedefs.MSampleRate],
+        threshold_ms: Optional[typedefs.MValue],
+    ) -> None:
+        """
+        Initialize a timer object, it's a sync and an async context manager and a
+        decorator sending a timing metric in milliseconds with microseconds
+        precision. Timer keeps a start time, so it can't be entered concurrently,
+        while calls of decorated functions are timed independently.
+        """
+        self._client = client
+        self._name = name
+        self._tags = tags
+        self._sample_rate = sample_rate
+        self._threshold_ms = threshold_ms
+        self._started_at = 0
+
+    def __enter__(self) -> "Timer":
+        self._started_at = perf_counter_ns()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._report(self._started_at)
+
+    async def __aenter__(self) -> "Timer":
+        self._started_at = perf_counter_ns()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self._report(self._started_at)
+
+    def __call__(self, func: _TFunc) -> _TFunc:
+        report = self._report
+
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                started_at = perf_counter_ns()
+                agen = func(*args, **kwargs)
+                try:
+                    # There is no `yield from` for async generators, so values and
+                    # exceptions sent into the wrapper are forwarded by hand
+                    item = await agen.__anext__()
+                    while True:
+                        try:
+                            value = yield item
+                        except GeneratorExit:
+                            raise
+                        # Anything thrown into the wrapper, e.g. cancellation, is
+                        # re-thrown into the wrapped generator to handle it
+                        except BaseException as exc:  # noqa: B036
+                            item = await agen.athrow(exc)
+                        else:
+                            item = await agen.asend(value)
+                except StopAsyncIteration:
+                    pass
+                finally:
+                    await agen.aclose()
+                    report(started_at)
+
+            return cast(_TFunc, async_gen_wrapper)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def coro_wrapper(*args, **kwargs):
+                started_at = perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    report(started_at)
+
+            return cast(_TFunc, coro_wrapper)
+
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                started_at = perf_counter_ns()
+                try:
+                    return (yield from func(*args, **kwargs))
+                finally:
+                    report(started_at)
+
+            return cast(_TFunc, gen_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started_at = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                report(started_at)
+
+        return cast(_TFunc, wrapper)
+
+    def _report(self, started_at: int) -> None:
+        value = _elapsed_ms(started_at)
+        if not self._threshold_ms or value > self._threshold_ms:
+            self._client.timing(
+                self._name, value=value, tags=self._tags, sample_rate=self._sample_rate
+            )
+
+
+def _elapsed_ms(started_at: int) -> float:
+    # Milliseconds with microseconds precision, so the value is short when sent
+    return (perf_counter_ns() - started_at) // 1000 / 1000
+
+
+def _to_list(values: Iterable[typedefs.MValue]) -> List[typedefs.MValue]:
+    # Objects supporting buffer protocol are converted to Python numbers at once,
+    # which is much faster than iterating over them
+    try:
+        view = memoryview(values)  # type: ignore
+    except TypeError:
+        return list(values)
+
+    try:
+        return cast(List[typedefs.MValue], view.tolist())
+    except NotImplementedError:
+        # Format isn't supported by `memoryview`, e.g. half-precision floats
+        return list(values)
+
+
+def _adapt(
+    sample_rate: typedefs.MSampleRate, adaptive_rate: float
+) -> typedefs.MSampleRate:
+    # Rounding keeps the number of distinct rates and cached headers small
+    return round(sample_rate * adaptive_rate, 6)
+
+
+def _sample(
+    values: Sequence[typedefs.MValue], sample_rate: typedefs.MSampleRate
+) -> List[typedefs.MValue]:
+    if sample_rate >= 1:
+        return list(values)
+    if sample_rate <= 0:
+        return []
+
+    # Gaps between kept values follow geometric distribution, so only kept values
+    # cost random numbers and the result is the same as sampling every value
+    log_q = math.log(1 - sample_rate)
+    last = len(values) - 1
+    sampled: List[typedefs.MValue] = []
+
+    idx = -1
+    while True:
+        idx += int(math.log(1 - random()) / log_q) + 1
+        if idx > last:
+            return sampled
+        sampled.append(values[idx])
+
+
+class MetricHandle:
+    __slots__ = (
+        "_client",
+        "_name",
+        "_tags",
+        "_serialized_tags",
+        "_sample_rate",
+        "_headers",
+    )
+
+    def __init__(
+        self,
+        client: Client,
+        name: typedefs.MName,
+        *,
+        tags: Optional[typedefs.MTags],
+        sample_rate: typedefs.MSampleRate,
+    ) -> None:
+        """
+        Initialize a handle object, metric headers are serialized once for every
+        metric type, so sending a metric only needs to format its value.
+        """
+        self._client = client
+        self._name = name
+        # Tags are fixed, so they are checked by the cardinality guard once
+        tags = self._tags = client._builder.guard_tags(name, tags)
+        self._serialized_tags = client._builder.build_tags(tags)
+        self._sample_rate = sample_rate
+        self._headers = {
+            type_: client._builder.build_header(
+                name=name, type_=type_, tags=tags, sample_rate=sample_rate
+            )
+            for type_ in typedefs.MType
+        }
+
+    def gauge(self, value: typedefs.MValue) -> None:
+        """
+        Record the value of a gauge.
+        """
+        self._report(typedefs.MType.GAUGE, value)
+
+    def increment(self, value: typedefs.MValue = 1) -> None:
+        """
+        Increment a counter, optionally setting a value.
+        """
+        self._report(typedefs.MType.COUNTER, value)
+
+    def decrement(self, value: typedefs.MValue = 1) -> None:
+        """
+        Decrement a counter, optionally setting a value.
+        """
+        value = -value if value else value
+        self._report(typedefs.MType.COUNTER, value)
+
+    def histogram(self, value: typedefs.MValue) -> None:
+        """
+        Sample a histogram value.
+        """
+        self._report(typedefs.MType.HISTOGRAM, value)
+
+    def distribution(self, value: typedefs.MValue) -> None:
+        """
+        Send a global distribution value.
+        """
+        self._report(typedefs.MType.DISTRIBUTION, value)
+
+    def timing(self, value: typedefs.MValue) -> None:
+        """
+        Record a timing.
+        """
+        self._report(typedefs.MType.TIMING, value)
+
+    def _report(self, type_: typedefs.MType, value: typedefs.MValue) -> None:
+        client = self._client
+
+        # Same flow as `Client._report`, but everything except a value is prepared
+        if (
+            client._state != typedefs.CState.CONNECTED
+            and not client._reconnect_if_forked()
+        ):
+            client._telemetry.metrics_dropped_closing += 1
+            return
+
+        if get_ident() != client._loop_thread_id:
+            client._report_threadsafe(self._process, (type_, value))
+            return
+
+        self._process(type_, value)
+
+    def _process(self, type_: typedefs.MType, value: typedefs.MValue) -> None:
+        client = self._client
+
+        # Headers are serialized for the handle's sample rate only, so metrics
+        # sampled adaptively take the client's path
+        if client._adaptive_rate != 1 and type_ in _ADAPTIVE_SAMPLED_TYPES:
+            client._process(self._name, type_, value, self._tags, self._sample_rate)
+            return
+
+        aggregated = type_ in client._aggregated_types
+
+        if aggregated and type_ in _AGGREGATED_TYPES:
+            client._aggregate(self._name, type_, value, self._serialized_tags)
+            return
+
+        if self._sample_rate != 1 and random() > self._sample_rate:
+            return
+
+        if aggregated:
+            client._aggregate(
+                self._name, type_, value, self._serialized_tags, self._sample_rate
+            )
+            return
+
+        head, tail = self._headers[type_]
+        client._enqueue(head + str(value).encode("utf-8") + tail)
+
+
 class DatagramProtocol(asyncio.DatagramProtocol):
-    __slots__ = ("_transport", "_closed")
+    __slots__ = (
+        "_transport",
+        "_closed",
+        "_failed",
+        "_send_failed",
+        "_scatter_gather",
+        "_direct_send",
+        "_sock",
+    )
+
+    @property
+    def connected(self) -> bool:
+        return self._transport is not None
+
+    @property
+    def failed(self) -> bool:
+        return self._failed
+
+    @property
+    def send_failed(self) -> bool:
+        return self._send_failed
 
-    def __init__(self) -> None:
+    def __init__(
+        self, *, scatter_gather: bool = False, direct_send: bool = False
+    ) -> None:
         self._transport: Optional[DatagramTransport] = None
         self._closed: asyncio.Future
+        self._failed = False
+        self._send_failed = False
+
+        # Raw socket is used to send data bypassing transport, it's a duplicate of
+        # the transport's socket
+        self._scatter_gather = scatter_gather and hasattr(socket.socket, "sendmsg")
+        self._direct_send = direct_send
+        self._sock: Optional[socket.socket] = None
 
     async def close(self) -> None:
         if self._transport is None:
@@ -319,16 +1486,107 @@ class DatagramProtocol(asyncio.DatagramProtocol):
         self._transport = transport
         self._closed = asyncio.Future()
 
+        sock = transport.get_extra_info("socket")
+        if (self._scatter_gather or self._direct_send) and sock is not None:
+            try:
+                self._sock = socket.fromfd(sock.fileno(), sock.family, sock.type)
+                self._sock.setblocking(False)
+            except OSError:
+                # Fall back to sending with transport
+                self._sock = None
+
     def connection_lost(self, _exc):
         self._transport = None
         self._closed.set_result(True)
 
-    def send(self, data: bytes) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def error_received(self, exc):
+        self._send_failed = True
+
+        # Connection errors mean that the server side is gone, e.g. the Unix domain
+        # socket file was removed
+        if isinstance(exc, (ConnectionError, FileNotFoundError)):
+            self._failed = True
+
+    def send(self, data: bytes) -> bool:
+        """
+        Send data, returns `False` if data wasn't sent.
+        """
         if self._transport is None:
-            return
+            return False
 
+        # Transport reports send errors with `error_received` callback
+        self._send_failed = False
         try:
             self._transport.sendto(data)
         except Exception:
             # Errors should fail silently so they don't affect anything else
-            pass
+            return False
+
+        return not self._send_failed
+
+    def send_direct(self, data: bytes) -> bool:
+        """
+        Send data right away bypassing transport, returns `False` if data wasn't
+        sent, e.g. socket isn't writable, so it should be sent with transport later.
+        """
+        sock = self._sock
+
+        # Datagrams buffered by transport must be sent first to keep the order
+        if sock is None or self._transport.get_write_buffer_size():  # type: ignore
+            return False
+
+        try:
+            sock.send(data)
+        except OSError as exc:
+            if not isinstance(exc, (BlockingIOError, InterruptedError)):
+                self.error_received(exc)
+            return False
+
+        return True
+
+    def send_lines(self, lines: List[bytes]) -> bool:
+        """
+        Send lines joined by newlines as a single datagram, returns `False` if data
+        wasn't sent.
+        """
+        sock = self._sock
+
+        # Datagrams buffered by transport must be sent first to keep the order
+        if (
+            sock is None
+            or not self._scatter_gather
+            or len(lines) * 2 - 1 > _IOV_MAX
+            or self._transport.get_write_buffer_size()  # type: ignore
+        ):
+            return self.send(b"\n".join(lines))
+
+        buffers = [b"\n"] * (len(lines) * 2 - 1)
+        buffers[::2] = lines
+        try:
+            sock.sendmsg(buffers)
+        except (BlockingIOError, InterruptedError):
+            # Socket isn't writable, so transport buffers the datagram until it is
+            return self.send(b"\n".join(lines))
+        except OSError as exc:
+            self.error_received(exc)
+            return False
+
+        return True
+
+
+# Clients connected in the current process, used to reset them after fork
+_clients: "WeakSet[Client]" = WeakSet()
+
+
+def _reset_after_fork() -> None:
+    for client in _clients:
+        client._reset_after_fork()
+    _clients.clear()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    os.register_at_fork(after_in_child=_reset_after_fork)
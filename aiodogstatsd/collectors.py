@@ -0,0 +1,288 @@
+import abc
+import asyncio
+import gc
+import os
+import threading
+from time import perf_counter_ns
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Union
+
+from aiodogstatsd import typedefs
+from aiodogstatsd.compat import get_event_loop
+
+__all__ = ("Collector", "InFlightCollector", "Metric", "RuntimeCollector")
+
+
+# No more GC pauses per generation are kept between collections
+_MAX_GC_PAUSES = 2 ** 10
+
+_TRouteTemplate = Union[str, Callable[[], Optional[str]]]
+
+
+class Metric(NamedTuple):
+    name: typedefs.MName
+    type_: typedefs.MType
+    values: Sequence[typedefs.MValue]
+    tags: Optional[typedefs.MTags] = None
+
+
+class Collector(abc.ABC):
+    __slots__ = ()
+
+    # Hooks are optional, so they do nothing by default
+    def start(self) -> None:  # noqa: B027
+        """
+        Called when the client is connected.
+        """
+
+    def stop(self) -> None:  # noqa: B027
+        """
+        Called when the client is closing.
+        """
+
+    def reset(self) -> None:  # noqa: B027
+        """
+        Called in a child process after fork, state inherited from the parent process
+        is dropped, so nothing is sent twice.
+        """
+
+    @abc.abstractmethod
+    def collect(self) -> List[Metric]:
+        """
+        Return metrics collected since the previous call. Multiple values of a metric
+        are sent like with `Client.submit_many`: counter values are summed, only the
+        last gauge value is sent and other values are packed together.
+        """
+
+
+class RuntimeCollector(Collector):
+    __slots__ = (
+        "_prefix",
+        "_gc_started_at",
+        "_gc_pauses",
+        "_gc_collections",
+        "_page_size",
+    )
+
+    def __init__(self, *, prefix: str = "runtime") -> None:
+        """
+        Collect GC pauses and collections per generation, RSS, the number of open
+        file descriptors, threads and asyncio tasks, metric names are prefixed by
+        `prefix`. Memory and file descriptors are read from `/proc`, so they are
+        collected on Linux only.
+        """
+        self._prefix = prefix
+
+        self._gc_started_at = 0
+        self._gc_pauses: Dict[int, List[float]] = {}
+        self._gc_collections = [stats["collections"] for stats in gc.get_stats()]
+
+        try:
+            self._page_size = os.sysconf("SC_PAGE_SIZE")
+        except (AttributeError, ValueError, OSError):  # pragma: no cover
+            self._page_size = 0
+
+    def start(self) -> None:
+        self._gc_collections = [stats["collections"] for stats in gc.get_stats()]
+        if self._on_gc not in gc.callbacks:
+            gc.callbacks.append(self._on_gc)
+
+    def stop(self) -> None:
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def reset(self) -> None:
+        self._gc_pauses = {}
+        self._gc_collections = [stats["collections"] for stats in gc.get_stats()]
+
+    def collect(self) -> List[Metric]:
+        prefix = self._prefix
+        metrics = []
+
+        gc_pauses, self._gc_pauses = self._gc_pauses, {}
+        for generation, pauses in gc_pauses.items():
+            metrics.append(
+                Metric(
+                    f"{prefix}.gc.pause",
+                    typedefs.MType.DISTRIBUTION,
+                    pauses,
+                    {"generation": generation},
+                )
+            )
+
+        # Collections are counted by interpreter even if GC callback missed them
+        for generation, stats in enumerate(gc.get_stats()):
+            collections = stats["collections"]
+            metrics.append(
+                Metric(
+                    f"{prefix}.gc.collections",
+                    typedefs.MType.COUNTER,
+                    (collections - self._gc_collections[generation],),
+                    {"generation": generation},
+                )
+            )
+            self._gc_collections[generation] = collections
+
+        rss = self._rss()
+        if rss is not None:
+            metrics.append(Metric(f"{prefix}.memory.rss", typedefs.MType.GAUGE, (rss,)))
+
+        fds = self._fds()
+        if fds is not None:
+            metrics.append(Metric(f"{prefix}.fds", typedefs.MType.GAUGE, (fds,)))
+
+        metrics.append(
+            Metric(
+                f"{prefix}.threads",
+                typedefs.MType.GAUGE,
+                (threading.active_count(),),
+            )
+        )
+        metrics.append(
+            Metric(
+                f"{prefix}.tasks",
+                typedefs.MType.GAUGE,
+                (len(asyncio.all_tasks(get_event_loop())),),
+            )
+        )
+
+        return metrics
+
+    def _on_gc(self, phase: str, info: Dict[str, int]) -> None:
+        if phase == "start":
+            self._gc_started_at = perf_counter_ns()
+            return
+
+        pauses = self._gc_pauses.setdefault(info["generation"], [])
+        if len(pauses) < _MAX_GC_PAUSES:
+            pauses.append((perf_counter_ns() - self._gc_started_at) // 1000 / 1000)
+
+    def _rss(self) -> Optional[int]:
+        # Second field of `statm` is resident set size in pages
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _fds(self) -> Optional[int]:
+        try:
+            return len(os.listdir("/proc/self/fd"))
+        except OSError:
+            return None
+
+
+class InFlightCollector(Collector):
+    __slots__ = (
+        "_name",
+        "_sample_interval",
+        "_requests",
+        "_next_token",
+        "_samples",
+        "_sums",
+        "_maxes",
+        "_templates",
+        "_handle",
+    )
+
+    def __init__(
+        self, *, name: str = "http_requests_in_flight", sample_interval: float = 1.0
+    ) -> None:
+        """
+        Count requests in flight per route template, requests are added and removed by
+        the web framework integrations. Requests are counted every `sample_interval`
+        seconds and max and mean of samples are sent as `name.max` and `name.mean`
+        gauges tagged by `path`, so the overhead doesn't depend on the number of
+        requests.
+        """
+        self._name = name
+        self._sample_interval = sample_interval
+
+        self._requests: Dict[int, _TRouteTemplate] = {}
+        self._next_token = 0
+
+        self._samples = 0
+        self._sums: Dict[str, int] = {}
+        self._maxes: Dict[str, int] = {}
+        # Templates sent before are sent once again with zeros after they become idle
+        self._templates: Set[str] = set()
+
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def enter(self, template: _TRouteTemplate) -> int:
+        """
+        Add a request in flight and return a token to remove it. Template can be a
+        function returning it, if it isn't known before the request is routed, the
+        function is called when requests are counted, requests without a template
+        aren't counted.
+        """
+        token = self._next_token
+        self._next_token += 1
+        self._requests[token] = template
+        return token
+
+    def leave(self, token: int) -> None:
+        self._requests.pop(token, None)
+
+    def start(self) -> None:
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def reset(self) -> None:
+        # Requests in flight in the parent process never leave in the child process.
+        # Timer belongs to the event loop of the parent process, so it's dropped
+        # without cancelling.
+        self._requests = {}
+        self._samples = 0
+        self._sums = {}
+        self._maxes = {}
+        self._templates = set()
+        self._handle = None
+
+    def collect(self) -> List[Metric]:
+        metrics = []
+
+        samples = self._samples
+        for template in self._templates.union(self._maxes):
+            tags = {"path": template}
+            mean = round(self._sums.get(template, 0) / samples, 3) if samples else 0
+            metrics.append(
+                Metric(
+                    f"{self._name}.max",
+                    typedefs.MType.GAUGE,
+                    (self._maxes.get(template, 0),),
+                    tags,
+                )
+            )
+            metrics.append(
+                Metric(f"{self._name}.mean", typedefs.MType.GAUGE, (mean,), tags)
+            )
+
+        self._templates = set(self._maxes)
+        self._samples = 0
+        self._sums = {}
+        self._maxes = {}
+
+        return metrics
+
+    def _schedule(self) -> None:
+        self._handle = get_event_loop().call_later(self._sample_interval, self._sample)
+
+    def _sample(self) -> None:
+        counts: Dict[str, int] = {}
+        for route_template in self._requests.values():
+            template = route_template() if callable(route_template) else route_template
+            if template is not None:
+                counts[template] = counts.get(template, 0) + 1
+
+        self._samples += 1
+        sums, maxes = self._sums, self._maxes
+        for template, count in counts.items():
+            sums[template] = sums.get(template, 0) + count
+            if count > maxes.get(template, 0):
+                maxes[template] = count
+
+        self._schedule()
@@ -1,10 +1,14 @@
+from collections import OrderedDict
 from http import HTTPStatus
-from typing import AsyncIterator, Awaitable, Callable, Optional, cast
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple, cast
 
 from aiohttp import web
+from aiohttp.payload import Payload
 from aiohttp.web_urldispatcher import DynamicResource, MatchInfoError
 
 from aiodogstatsd import Client, typedefs
+from aiodogstatsd.client import MetricHandle
+from aiodogstatsd.collectors import Collector, InFlightCollector
 from aiodogstatsd.compat import get_event_loop
 
 __all__ = (
@@ -12,6 +16,7 @@ __all__ = (
     "DEAFULT_REQUEST_DURATION_METRIC_NAME",
     "cleanup_context_factory",
     "middleware_factory",
+    "on_response_prepare",
 )
 
 
@@ -21,6 +26,16 @@ DEAFULT_REQUEST_DURATION_METRIC_NAME = "http_request_duration"
 
 _THandler = Callable[[web.Request], Awaitable[web.StreamResponse]]
 _TMiddleware = Callable[[web.Request, _THandler], Awaitable[web.StreamResponse]]
+_THandleKey = Tuple[str, str, str, int]
+_TResponsePrepare = Callable[[web.Request, web.StreamResponse, float], None]
+
+# Handles are cached per metric name, request method, path and response status, paths
+# of unmatched requests are unbounded, so the cache is bounded as well
+_HANDLES_CACHE_SIZE = 2 ** 10
+
+# Middleware passes the response prepare callback and request start time to the
+# `on_response_prepare` signal handler
+_RESPONSE_PREPARE_KEY = "aiodogstatsd_response_prepare"
 
 
 def cleanup_context_factory(
@@ -28,21 +43,27 @@ def cleanup_context_factory(
     client_app_key: str = DEFAULT_CLIENT_APP_KEY,
     host: str = "localhost",
     port: int = 9125,
+    socket_path: Optional[str] = None,
     namespace: Optional[typedefs.MNamespace] = None,
     constant_tags: Optional[typedefs.MTags] = None,
     read_timeout: float = 0.5,
     close_timeout: Optional[float] = None,
     sample_rate: typedefs.MSampleRate = 1,
+    collectors: Sequence[Collector] = (),
+    collect_interval: float = 10.0,
 ) -> Callable[[web.Application], AsyncIterator[None]]:
     async def cleanup_context(app: web.Application) -> AsyncIterator[None]:
         app[client_app_key] = Client(
             host=host,
             port=port,
+            socket_path=socket_path,
             namespace=namespace,
             constant_tags=constant_tags,
             read_timeout=read_timeout,
             close_timeout=close_timeout,
             sample_rate=sample_rate,
+            collectors=collectors,
+            collect_interval=collect_interval,
         )
         await app[client_app_key].connect()
         yield
@@ -57,7 +78,90 @@ def middleware_factory(
     request_duration_metric_name: str = DEAFULT_REQUEST_DURATION_METRIC_NAME,
     collect_not_allowed: bool = False,
     collect_not_found: bool = False,
+    time_to_first_byte_metric_name: Optional[str] = None,
+    response_duration_metric_name: Optional[str] = None,
+    response_size_metric_name: Optional[str] = None,
+    in_flight_collector: Optional[InFlightCollector] = None,
 ) -> _TMiddleware:
+    handles: "OrderedDict[_THandleKey, MetricHandle]" = OrderedDict()
+    handles_client: Optional[Client] = None
+
+    def get_handle(client: Client, key: _THandleKey) -> MetricHandle:
+        nonlocal handles_client
+
+        # Handles are bound to the client, which is recreated on every app start
+        if client is not handles_client:
+            handles.clear()
+            handles_client = client
+
+        handle = handles.get(key)
+        if handle is None:
+            name, method, path, status = key
+            handle = client.handle(
+                name, tags={"method": method, "path": path, "status": status}
+            )
+            if len(handles) >= _HANDLES_CACHE_SIZE:
+                handles.popitem(last=False)
+            handles[key] = handle
+        else:
+            handles.move_to_end(key)
+
+        return handle
+
+    def response_prepare(
+        request: web.Request, response: web.StreamResponse, request_started_at: float
+    ) -> None:
+        response_status = response.status
+        if not _proceed_collecting(
+            request, response_status, collect_not_allowed, collect_not_found
+        ):
+            return
+
+        loop = get_event_loop()
+        client = request.app[client_app_key]
+        method, path = request.method, _derive_request_path(request)
+
+        if time_to_first_byte_metric_name is not None:
+            time_to_first_byte = (loop.time() - request_started_at) * 1000
+            get_handle(
+                client, (time_to_first_byte_metric_name, method, path, response_status)
+            ).timing(time_to_first_byte)
+
+        if response_duration_metric_name is None and response_size_metric_name is None:
+            return
+
+        write_eof = response.write_eof
+        written = _count_written(response)
+        sent = False
+
+        async def write_eof_and_collect(data: bytes = b"") -> None:
+            nonlocal sent
+
+            await write_eof(data)
+            # Handler may send EOF itself, then it's sent again after the handler
+            if sent:
+                return
+            sent = True
+
+            if response_duration_metric_name is not None:
+                response_duration = (loop.time() - request_started_at) * 1000
+                get_handle(
+                    client,
+                    (response_duration_metric_name, method, path, response_status),
+                ).timing(response_duration)
+            if response_size_metric_name is not None:
+                get_handle(
+                    client, (response_size_metric_name, method, path, response_status)
+                ).distribution(written() + len(data) + _unwritten_body_size(response))
+
+        response.write_eof = write_eof_and_collect  # type: ignore
+
+    collect_response = (
+        time_to_first_byte_metric_name is not None
+        or response_duration_metric_name is not None
+        or response_size_metric_name is not None
+    )
+
     @web.middleware
     async def middleware(
         request: web.Request, handler: _THandler
@@ -65,6 +169,16 @@ def middleware_factory(
         loop = get_event_loop()
         request_started_at = loop.time()
 
+        if collect_response:
+            request[_RESPONSE_PREPARE_KEY] = (response_prepare, request_started_at)
+
+        # Requests not matched by any route aren't counted in flight
+        in_flight_token = None
+        if in_flight_collector is not None and not isinstance(
+            request.match_info, MatchInfoError
+        ):
+            in_flight_token = in_flight_collector.enter(_derive_request_path(request))
+
         # By default response status is 500 because we don't want to write any logic for
         # catching exceptions except exceptions which inherited from
         # `web.HTTPException`. And also we will override response status in case of any
@@ -78,25 +192,72 @@ def middleware_factory(
             response_status = e.status
             raise e
         finally:
+            if in_flight_token is not None:
+                cast(InFlightCollector, in_flight_collector).leave(in_flight_token)
+
             if _proceed_collecting(  # pragma: no branch
                 request, response_status, collect_not_allowed, collect_not_found
             ):
                 request_duration = (loop.time() - request_started_at) * 1000
-                request.app[client_app_key].timing(  # pragma: no branch
-                    request_duration_metric_name,
-                    value=request_duration,
-                    tags={
-                        "method": request.method,
-                        "path": _derive_request_path(request),
-                        "status": response_status,
-                    },
+                handle = get_handle(
+                    request.app[client_app_key],
+                    (
+                        request_duration_metric_name,
+                        request.method,
+                        _derive_request_path(request),
+                        response_status,
+                    ),
                 )
+                handle.timing(request_duration)  # pragma: no branch
 
         return response
 
     return middleware
 
 
+async def on_response_prepare(
+    request: web.Request, response: web.StreamResponse
+) -> None:
+    """
+    Signal handler to collect time to first byte, response duration and size, it
+    should be appended to `on_response_prepare` signal of the application.
+    """
+    response_prepare: Optional[Tuple[_TResponsePrepare, float]] = request.get(
+        _RESPONSE_PREPARE_KEY
+    )
+    if response_prepare is not None:
+        callback, request_started_at = response_prepare
+        callback(request, response, request_started_at)
+
+
+def _count_written(response: web.StreamResponse) -> Callable[[], int]:
+    # Body is counted before compression and chunked encoding, so the size is the same
+    # as reported by Starlette integration
+    write = response.write
+    written = 0
+
+    async def write_and_count(data: bytes) -> None:
+        nonlocal written
+
+        written += len(data)
+        await write(data)
+
+    response.write = write_and_count  # type: ignore
+    return lambda: written
+
+
+def _unwritten_body_size(response: web.StreamResponse) -> int:
+    # Body of `web.Response` and files are passed to the payload writer directly
+    if isinstance(response, web.Response):
+        body = response.body
+        if isinstance(body, Payload):
+            return body.size or 0
+        return len(body) if body is not None else 0
+    if isinstance(response, web.FileResponse):
+        return response.content_length or 0
+    return 0
+
+
 def _proceed_collecting(
     request: web.Request,
     response_status: int,
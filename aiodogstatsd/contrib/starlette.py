@@ -1,14 +1,12 @@
+from collections import OrderedDict
 from http import HTTPStatus
-from typing import Awaitable, Callable, Optional, Tuple, cast
+from typing import Any, Dict, List, Optional, Tuple, cast
 
-from starlette.applications import Starlette
-from starlette.exceptions import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.routing import Match as RouteMatch, Route, Router
+from starlette.routing import BaseRoute, Host, Match as RouteMatch, Mount, Route, Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from aiodogstatsd import Client
+from aiodogstatsd.collectors import InFlightCollector
 from aiodogstatsd.compat import get_event_loop
 
 __all__ = (
@@ -19,72 +17,163 @@ __all__ = (
 
 DEAFULT_REQUEST_DURATION_METRIC_NAME = "http_request_duration"
 
+# Templates are cached per request path and method, paths of unmatched requests and
+# requests to routes sharing an endpoint are unbounded, so the cache is bounded
+_TEMPLATES_CACHE_SIZE = 2 ** 10
 
-class StatsDMiddleware(BaseHTTPMiddleware):
+
+class StatsDMiddleware:
     __slots__ = (
+        "_app",
         "_client",
         "_request_duration_metric_name",
         "_collect_not_allowed",
         "_collect_not_found",
+        "_time_to_first_byte_metric_name",
+        "_response_size_metric_name",
+        "_in_flight_collector",
+        "_route_templates",
     )
 
     def __init__(
         self,
-        app: Starlette,
+        app: ASGIApp,
         *,
         client: Client,
         request_duration_metric_name: str = DEAFULT_REQUEST_DURATION_METRIC_NAME,
         collect_not_allowed: bool = False,
         collect_not_found: bool = False,
+        time_to_first_byte_metric_name: Optional[str] = None,
+        response_size_metric_name: Optional[str] = None,
+        in_flight_collector: Optional[InFlightCollector] = None,
     ) -> None:
-        super().__init__(app)
+        """
+        Pure ASGI middleware, it only wraps `send` to get response status, so
+        streaming responses and background tasks work as without it.
 
+        Request duration is measured until the last body chunk is sent, time to first
+        byte is measured until response start is sent and response size is a sum of
+        body chunks sizes.
+        """
+        self._app = app
         self._client = client
         self._request_duration_metric_name = request_duration_metric_name
         self._collect_not_allowed = collect_not_allowed
         self._collect_not_found = collect_not_found
+        self._time_to_first_byte_metric_name = time_to_first_byte_metric_name
+        self._response_size_metric_name = response_size_metric_name
+        self._in_flight_collector = in_flight_collector
+        self._route_templates = _RouteTemplates()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
 
-    async def dispatch(
-        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
-    ) -> Response:
         loop = get_event_loop()
         request_started_at = loop.time()
 
+        # Mounts replace request path in the scope with the remaining path
+        request_path = scope["path"]
+        request_root_path = scope.get("root_path", "")
+
         # By default response status is 500 because we don't want to write any logic for
-        # catching exceptions except exceptions which inherited from `HTTPException`.
-        # And also we will override response status in case of any successful handler
-        # execution.
+        # catching exceptions, if response was started before an exception then its
+        # status is sent.
         response_status = cast(int, HTTPStatus.INTERNAL_SERVER_ERROR.value)
+        response_size = 0
+        collected = False
+        tags: Optional[Dict[str, Any]] = None
+
+        def get_tags() -> Optional[Dict[str, Any]]:
+            nonlocal tags
+
+            # Response status isn't changed after response start, so tags are built
+            # once per request
+            if tags is None:
+                request_path_template = self._route_templates.resolve(
+                    scope, request_path, request_root_path
+                )
+                if not _proceed_collecting(
+                    request_path_template,
+                    response_status,
+                    self._collect_not_allowed,
+                    self._collect_not_found,
+                ):
+                    return None
+
+                tags = {
+                    "method": scope["method"],
+                    "path": request_path_template or request_path,
+                    "status": response_status,
+                }
+
+            return tags
+
+        def collect(*, sent: bool) -> None:
+            nonlocal collected
+            collected = True
+
+            request_tags = get_tags()
+            if request_tags is None:
+                return
+
+            request_duration = (loop.time() - request_started_at) * 1000
+            self._client.timing(
+                self._request_duration_metric_name,
+                value=request_duration,
+                tags=request_tags,
+            )
+            if sent and self._response_size_metric_name is not None:
+                self._client.distribution(
+                    self._response_size_metric_name,
+                    value=response_size,
+                    tags=request_tags,
+                )
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_status, response_size
+
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                await send(message)
+
+                if self._time_to_first_byte_metric_name is not None:
+                    request_tags = get_tags()
+                    if request_tags is not None:
+                        time_to_first_byte = (loop.time() - request_started_at) * 1000
+                        self._client.timing(
+                            self._time_to_first_byte_metric_name,
+                            value=time_to_first_byte,
+                            tags=request_tags,
+                        )
+                return
+
+            await send(message)
+
+            if message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    collect(sent=True)
+
+        # Request isn't routed yet, so its template is resolved when requests in flight
+        # are counted
+        in_flight_collector = self._in_flight_collector
+        if in_flight_collector is not None:
+            in_flight_token = in_flight_collector.enter(
+                lambda: self._route_templates.resolve(
+                    scope, request_path, request_root_path
+                )
+            )
 
         try:
-            response = await call_next(request)
-            response_status = response.status_code
-        except HTTPException as e:  # pragma: no cover
-            # We kept exception handling here (just in case), but code looks useless.
-            # We're unable to cover that part of code with tests because the framework
-            # handles exceptions somehow different, somehow deeply inside.
-            response_status = e.status_code
-            raise e
+            await self._app(scope, receive, send_wrapper)
         finally:
-            request_path, request_path_template = _derive_request_path(request)
-            if _proceed_collecting(  # pragma: no branch
-                request_path_template,
-                response_status,
-                self._collect_not_allowed,
-                self._collect_not_found,
-            ):
-                request_duration = (loop.time() - request_started_at) * 1000
-                self._client.timing(  # pragma: no branch
-                    self._request_duration_metric_name,
-                    value=request_duration,
-                    tags={
-                        "method": request.method,
-                        "path": request_path_template or request_path,
-                        "status": response_status,
-                    },
-                )
+            if in_flight_collector is not None:
+                in_flight_collector.leave(in_flight_token)
 
-        return response
+            if not collected:
+                collect(sent=False)
 
 
 def _proceed_collecting(
@@ -105,16 +194,108 @@ def _proceed_collecting(
     return True
 
 
-def _derive_request_path(request: Request) -> Tuple[str, Optional[str]]:
-    # We need somehow understand request path in templated view this needed in case of
-    # parametrized routes. Current realization is not very efficient, but for now, there
-    # is no better way to do such things.
-    router: Router = request.scope["router"]
-    for route in router.routes:
-        match, _ = route.matches(request.scope)
-        if match == RouteMatch.NONE:
+class _RouteTemplates:
+    __slots__ = ("_router", "_endpoints", "_cache")
+
+    def __init__(self) -> None:
+        """
+        Resolve path templates of matched routes. Router puts endpoint of the
+        matched route into the scope, so template is looked up by the endpoint in
+        the index of all routes including mounted ones. Routes are matched again
+        only if the endpoint is missing or shared by several routes.
+        """
+        self._router: Optional[Router] = None
+        self._endpoints: Dict[Any, Optional[str]] = {}
+        self._cache: "OrderedDict[Tuple[str, str], Optional[str]]" = OrderedDict()
+
+    def resolve(self, scope: Scope, path: str, root_path: str) -> Optional[str]:
+        router: Optional[Router] = scope.get("router")
+        if router is None:
+            return None
+
+        if router is not self._router:
+            self._router = router
+            self._endpoints = _index_endpoints(router.routes, "", {})
+            self._cache.clear()
+
+        try:
+            template = self._endpoints.get(scope.get("endpoint"))
+        except TypeError:
+            template = None
+        if template is not None:
+            return template
+
+        key = (path, scope["method"])
+        cache = self._cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        template = _match(
+            router.routes,
+            {**scope, "path": path, "root_path": root_path, "path_params": {}},
+            "",
+        )
+        if len(cache) >= _TEMPLATES_CACHE_SIZE:
+            cache.popitem(last=False)
+        cache[key] = template
+
+        return template
+
+
+def _index_endpoints(
+    routes: List[BaseRoute], prefix: str, index: Dict[Any, Optional[str]]
+) -> Dict[Any, Optional[str]]:
+    # Endpoints shared by several routes are indexed as `None`
+    for route in routes:
+        if isinstance(route, (Mount, Host)) and route.routes:
+            _index_endpoints(route.routes, _prefix(route, prefix), index)
             continue
 
-        return request["path"], cast(Route, route).path
+        if isinstance(route, Route):
+            endpoint, template = route.endpoint, prefix + route.path
+        elif isinstance(route, Mount):
+            endpoint, template = route.app, prefix + route.path
+        else:
+            continue
+
+        try:
+            index[endpoint] = (
+                template if index.get(endpoint, template) == template else None
+            )
+        except TypeError:
+            continue
+
+    return index
+
+
+def _match(routes: List[BaseRoute], scope: Scope, prefix: str) -> Optional[str]:
+    # Same order as in `Router`, the first full match wins, otherwise the first
+    # partial one
+    partial: Optional[Tuple[BaseRoute, Scope]] = None
+    for route in routes:
+        match, child_scope = route.matches(scope)
+        if match == RouteMatch.FULL:
+            return _template(route, {**scope, **child_scope}, prefix)
+        if match == RouteMatch.PARTIAL and partial is None:
+            partial = (route, child_scope)
+
+    if partial is not None:
+        route, child_scope = partial
+        return _template(route, {**scope, **child_scope}, prefix)
+
+    return None
+
+
+def _template(route: BaseRoute, scope: Scope, prefix: str) -> Optional[str]:
+    if isinstance(route, (Mount, Host)) and route.routes:
+        return _match(route.routes, scope, _prefix(route, prefix))
+    if isinstance(route, Host):
+        # Host has no path of its own, apps without routes have no templates
+        return prefix or None
+
+    return prefix + cast(Route, route).path
+
 
-    return request["path"], None
+def _prefix(route: BaseRoute, prefix: str) -> str:
+    return prefix + route.path if isinstance(route, Mount) else prefix
@@ -0,0 +1,80 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional
+
+from aiodogstatsd.compat import get_event_loop
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiodogstatsd.client import Client
+
+__all__ = ("LOOP_MONITOR_NAMESPACE", "LoopMonitor")
+
+
+LOOP_MONITOR_NAMESPACE = "event_loop"
+
+
+class LoopMonitor:
+    __slots__ = (
+        "_client",
+        "_interval",
+        "_slow_callback_threshold",
+        "_loop",
+        "_handle",
+        "_expected_at",
+    )
+
+    def __init__(
+        self, client: "Client", *, interval: float, slow_callback_threshold: float
+    ) -> None:
+        """
+        Monitor the event loop with a probe scheduled every `interval` seconds.
+
+        Probe reports how late it was called as a distribution in milliseconds,
+        the number of tasks as a gauge and counts probes delayed by more than
+        `slow_callback_threshold` seconds. Probe is a single timer callback per
+        interval, so it's cheap enough to run all the time.
+        """
+        self._client = client
+        self._interval = interval
+        self._slow_callback_threshold = slow_callback_threshold
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected_at = 0.0
+
+    def start(self) -> None:
+        self._loop = get_event_loop()
+        self._schedule(self._loop.time())
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def reset(self) -> None:
+        # Timer belongs to the event loop of the parent process after fork, so it's
+        # dropped without cancelling
+        self._loop = None
+        self._handle = None
+
+    def _schedule(self, now: float) -> None:
+        assert self._loop is not None
+
+        self._expected_at = now + self._interval
+        self._handle = self._loop.call_at(self._expected_at, self._probe)
+
+    def _probe(self) -> None:
+        assert self._loop is not None
+
+        now = self._loop.time()
+        # Timers are called a bit earlier within the clock resolution
+        lag = max(now - self._expected_at, 0.0)
+
+        client = self._client
+        client.distribution(f"{LOOP_MONITOR_NAMESPACE}.lag", value=round(lag * 1000, 3))
+        if lag > self._slow_callback_threshold:
+            client.increment(f"{LOOP_MONITOR_NAMESPACE}.delayed_probes")
+        client.gauge(
+            f"{LOOP_MONITOR_NAMESPACE}.tasks", value=len(asyncio.all_tasks(self._loop))
+        )
+
+        self._schedule(now)
@@ -1,8 +1,188 @@
-from typing import Optional
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 
 from aiodogstatsd import typedefs
+from aiodogstatsd.cardinality import CardinalityGuard
 
-__all__ = ("build", "build_tags")
+__all__ = (
+    "Builder",
+    "CacheInfo",
+    "build",
+    "build_packed",
+    "build_serialized",
+    "build_tags",
+    "pack",
+)
+
+
+_THeader = Tuple[bytes, bytes]
+_THeaderKey = Tuple[
+    typedefs.MName,
+    typedefs.MType,
+    Optional[Tuple[Tuple[typedefs.MTagKey, typedefs.MTagValue], ...]],
+    typedefs.MSampleRate,
+]
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class Builder:
+    __slots__ = (
+        "_guard",
+        "_constant_tags",
+        "_p_namespace",
+        "_p_constant_tags",
+        "_cache",
+        "_cache_size",
+        "_hits",
+        "_misses",
+    )
+
+    def __init__(
+        self,
+        *,
+        namespace: Optional[typedefs.MNamespace],
+        constant_tags: typedefs.MTags,
+        cache_size: int,
+        guard: Optional[CardinalityGuard] = None,
+    ) -> None:
+        """
+        Build metrics with namespace and constant tags serialized once.
+
+        Metric header, everything except a value, is kept in LRU cache of
+        `cache_size` entries keyed by metric name, type, tags and sample rate. Tags
+        are checked by `guard` only when a header isn't cached.
+        """
+        self._guard = guard
+        self._constant_tags = constant_tags
+        self._p_namespace = f"{namespace}." if namespace is not None else ""
+        self._p_constant_tags = build_tags(constant_tags)
+
+        self._cache: "OrderedDict[_THeaderKey, _THeader]" = OrderedDict()
+        self._cache_size = cache_size
+        self._hits = 0
+        self._misses = 0
+
+    def build(
+        self,
+        *,
+        name: typedefs.MName,
+        value: typedefs.MValue,
+        type_: typedefs.MType,
+        tags: Optional[typedefs.MTags],
+        sample_rate: typedefs.MSampleRate,
+    ) -> bytes:
+        key = (name, type_, tuple(tags.items()) if tags else None, sample_rate)
+
+        header = self._cache.get(key)
+        if header is None:
+            self._misses += 1
+
+            if self._guard is not None and tags:
+                collapsed = self._guard.check(name, tags)
+                if collapsed is not None:
+                    # Header with collapsed tags is cached under its own key, so
+                    # offending tag values don't evict known headers
+                    return self.build(
+                        name=name,
+                        value=value,
+                        type_=type_,
+                        tags=collapsed,
+                        sample_rate=sample_rate,
+                    )
+
+            header = self.build_header(
+                name=name, type_=type_, tags=tags, sample_rate=sample_rate
+            )
+            if self._cache_size:
+                if len(self._cache) >= self._cache_size:
+                    self._cache.popitem(last=False)
+                self._cache[key] = header
+        else:
+            self._hits += 1
+            self._cache.move_to_end(key)
+
+        head, tail = header
+        return head + str(value).encode("utf-8") + tail
+
+    def build_packed(
+        self,
+        *,
+        name: typedefs.MName,
+        values: Iterable[typedefs.MValue],
+        type_: typedefs.MType,
+        tags: Optional[typedefs.MTags],
+        sample_rate: typedefs.MSampleRate,
+        max_size: int,
+    ) -> List[bytes]:
+        """
+        Build lines with multiple values of the same metric, every line is no longer
+        than `max_size` bytes if possible.
+        """
+        tags = self.guard_tags(name, tags)
+        head, tail = self.build_header(
+            name=name, type_=type_, tags=tags, sample_rate=sample_rate
+        )
+
+        return pack(head=head, values=values, tail=tail, max_size=max_size)
+
+    def guard_tags(
+        self, name: typedefs.MName, tags: Optional[typedefs.MTags]
+    ) -> Optional[typedefs.MTags]:
+        """
+        Return tags collapsed by the cardinality guard if needed.
+        """
+        if self._guard is None or not tags:
+            return tags
+
+        return self._guard.check(name, tags) or tags
+
+    def build_tags(self, tags: Optional[typedefs.MTags]) -> str:
+        """
+        Serialize tags merged with constant tags.
+        """
+        if not tags:
+            return self._p_constant_tags
+        if not self._p_constant_tags:
+            return build_tags(tags)
+        if self._constant_tags.keys() & tags.keys():
+            # Constant tags are overridden, so we need to keep the original order
+            return build_tags(dict(self._constant_tags, **tags))
+
+        return f"{self._p_constant_tags},{build_tags(tags)}"
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            maxsize=self._cache_size,
+            currsize=len(self._cache),
+        )
+
+    def build_header(
+        self,
+        *,
+        name: typedefs.MName,
+        type_: typedefs.MType,
+        tags: Optional[typedefs.MTags],
+        sample_rate: typedefs.MSampleRate,
+    ) -> _THeader:
+        """
+        Serialize metric header, a pair of bytes to put before and after a value.
+        """
+        p_sample_rate = f"|@{sample_rate}" if sample_rate != 1 else ""
+        p_tags = self.build_tags(tags)
+        p_tags = f"|#{p_tags}" if p_tags else ""
+
+        return (
+            f"{self._p_namespace}{name}:".encode("utf-8"),
+            f"|{type_.value}{p_sample_rate}{p_tags}".encode("utf-8"),
+        )
 
 
 def build(
@@ -13,16 +193,86 @@ def build(
     type_: typedefs.MType,
     tags: typedefs.MTags,
     sample_rate: typedefs.MSampleRate,
+) -> bytes:
+    return build_serialized(
+        name=name,
+        namespace=namespace,
+        value=value,
+        type_=type_,
+        tags=build_tags(tags),
+        sample_rate=sample_rate,
+    )
+
+
+def build_serialized(
+    *,
+    name: typedefs.MName,
+    namespace: Optional[typedefs.MNamespace],
+    value: typedefs.MValue,
+    type_: typedefs.MType,
+    tags: str,
+    sample_rate: typedefs.MSampleRate,
 ) -> bytes:
     p_name = f"{namespace}.{name}" if namespace is not None else name
     p_sample_rate = f"|@{sample_rate}" if sample_rate != 1 else ""
-
-    p_tags = build_tags(tags)
-    p_tags = f"|#{p_tags}" if p_tags else ""
+    p_tags = f"|#{tags}" if tags else ""
 
     return f"{p_name}:{value}|{type_.value}{p_sample_rate}{p_tags}".encode("utf-8")
 
 
+def build_packed(
+    *,
+    name: typedefs.MName,
+    namespace: Optional[typedefs.MNamespace],
+    values: Iterable[typedefs.MValue],
+    type_: typedefs.MType,
+    tags: str,
+    sample_rate: typedefs.MSampleRate,
+    max_size: int,
+) -> List[bytes]:
+    p_name = f"{namespace}.{name}" if namespace is not None else name
+    p_sample_rate = f"|@{sample_rate}" if sample_rate != 1 else ""
+    p_tags = f"|#{tags}" if tags else ""
+
+    return pack(
+        head=f"{p_name}:".encode("utf-8"),
+        values=values,
+        tail=f"|{type_.value}{p_sample_rate}{p_tags}".encode("utf-8"),
+        max_size=max_size,
+    )
+
+
+def pack(
+    *, head: bytes, values: Iterable[typedefs.MValue], tail: bytes, max_size: int
+) -> List[bytes]:
+    # Multiple values of the same metric are packed into one line, e.g.
+    # `name:1:2:3|h`, lines are split to not exceed `max_size` if possible.
+    # Values are serialized at once and lines are cut at value separators, so there
+    # is no Python level work per value.
+    body = ":".join(map(str, values)).encode("utf-8")
+    if not body:
+        return []
+
+    limit = max(max_size - len(head) - len(tail), 0)
+
+    lines = []
+    start = 0
+    while len(body) - start > limit:
+        end = body.rfind(b":", start, start + limit + 1)
+        if end <= start:
+            # Value doesn't fit into a line, so it's sent in a line on its own
+            end = body.find(b":", start)
+            if end == -1:
+                break
+
+        lines.append(head + body[start:end] + tail)
+        start = end + 1
+
+    lines.append(head + body[start:] + tail)
+
+    return lines
+
+
 def build_tags(tags: typedefs.MTags) -> str:
     if not tags:
         return ""
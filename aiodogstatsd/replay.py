@@ -0,0 +1,153 @@
+import mmap
+import os
+import struct
+from typing import Optional, Union
+
+__all__ = ("ReplayBuffer",)
+
+
+# Ring state is kept in front of packets, so packets left in a file are replayed by
+# the next client using the same file
+_HEADER = struct.Struct("<4sQQQ")
+_MAGIC = b"ADRB"
+_LENGTH = struct.Struct("<I")
+
+
+class ReplayBuffer:
+    __slots__ = ("_buf", "_capacity", "_head", "_used", "_count", "dropped")
+
+    def __init__(self, *, max_size: int, path: Optional[str] = None) -> None:
+        """
+        Keep packets which weren't sent in a ring buffer of `max_size` bytes, the
+        oldest packets are dropped when it's full. Packets are stored with their
+        lengths in memory or in a memory-mapped file at `path`, so the buffer never
+        takes more than `max_size` bytes of memory.
+        """
+        self._capacity = max(max_size - _HEADER.size, 0)
+        self._head = 0
+        self._used = 0
+        self._count = 0
+        self.dropped = 0
+
+        self._buf: Union[bytearray, mmap.mmap]
+        if path is None:
+            self._buf = bytearray(_HEADER.size + self._capacity)
+        else:
+            self._buf = _map(path, _HEADER.size + self._capacity)
+
+            magic, capacity, head, used = _HEADER.unpack_from(self._buf)
+            if magic == _MAGIC and capacity == self._capacity and used <= capacity:
+                self._head, self._used = head, used
+                self._count = self._count_packets()
+
+        self._store_header()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def size(self) -> int:
+        """
+        Return the number of bytes taken by packets.
+        """
+        return self._used
+
+    def push(self, packet: bytes) -> None:
+        size = _LENGTH.size + len(packet)
+        if size > self._capacity:
+            self.dropped += 1
+            return
+
+        while self._used + size > self._capacity:
+            self._drop()
+            self.dropped += 1
+
+        tail = (self._head + self._used) % self._capacity
+        self._write(tail, _LENGTH.pack(len(packet)))
+        self._write((tail + _LENGTH.size) % self._capacity, packet)
+        self._used += size
+        self._count += 1
+
+        self._store_header()
+
+    def peek(self) -> Optional[bytes]:
+        """
+        Return the oldest packet without removing it.
+        """
+        if not self._count:
+            return None
+
+        (length,) = _LENGTH.unpack(self._read(self._head, _LENGTH.size))
+        return self._read((self._head + _LENGTH.size) % self._capacity, length)
+
+    def pop(self) -> None:
+        """
+        Remove the oldest packet.
+        """
+        if self._count:
+            self._drop()
+            self._store_header()
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.flush()
+            self._buf.close()
+
+    def _drop(self) -> None:
+        (length,) = _LENGTH.unpack(self._read(self._head, _LENGTH.size))
+        size = _LENGTH.size + length
+
+        self._head = (self._head + size) % self._capacity
+        self._used -= size
+        self._count -= 1
+        if not self._count:
+            self._head = 0
+
+    def _count_packets(self) -> int:
+        count, offset, left = 0, self._head, self._used
+        while left >= _LENGTH.size:
+            (length,) = _LENGTH.unpack(self._read(offset, _LENGTH.size))
+            size = _LENGTH.size + length
+            if size > left:
+                # File is corrupted, e.g. the process was killed in the middle of a
+                # write, so the rest is dropped
+                self._used -= left
+                break
+
+            count += 1
+            offset = (offset + size) % self._capacity
+            left -= size
+
+        return count
+
+    def _store_header(self) -> None:
+        _HEADER.pack_into(self._buf, 0, _MAGIC, self._capacity, self._head, self._used)
+
+    def _write(self, offset: int, data: bytes) -> None:
+        # Data wraps around the end of the ring
+        start = _HEADER.size + offset
+        first = min(len(data), self._capacity - offset)
+        self._buf[start : start + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            self._buf[_HEADER.size : _HEADER.size + rest] = data[first:]
+
+    def _read(self, offset: int, size: int) -> bytes:
+        start = _HEADER.size + offset
+        first = min(size, self._capacity - offset)
+        data = bytes(self._buf[start : start + first])
+        if first < size:
+            data += bytes(self._buf[_HEADER.size : _HEADER.size + size - first])
+        return data
+
+
+def _map(path: str, size: int) -> mmap.mmap:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size != size:
+            # Ring of another size can't be reused
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, size)
+        return mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
@@ -0,0 +1,53 @@
+import math
+
+__all__ = ("AdaptiveSampler",)
+
+
+class AdaptiveSampler:
+    __slots__ = (
+        "rate",
+        "_threshold",
+        "_min_rate",
+        "_interval",
+        "_increase_at",
+        "_max_fill",
+    )
+
+    def __init__(self, *, threshold: float, min_rate: float, interval: float) -> None:
+        """
+        Control sample rate by the pending queue fill level, a ratio of the number of
+        metrics enqueued between drains to the queue size.
+
+        Rate is halved as many times as needed to bring fill level under `threshold`
+        as soon as it's exceeded, but not lower than `min_rate`. Rate is doubled
+        every `interval` seconds while fill level stays under a half of `threshold`,
+        so it would stay under `threshold` after that. Rate is always a power of two
+        fraction or `min_rate` multiplied by a power of two, so sampled metrics only
+        have a few distinct rates.
+        """
+        self.rate = 1.0
+
+        self._threshold = threshold
+        self._min_rate = min_rate
+        self._interval = interval
+        self._increase_at = 0.0
+        self._max_fill = 0.0
+
+    def observe(self, fill: float, now: float) -> None:
+        if fill > self._threshold:
+            steps = math.ceil(math.log2(fill / self._threshold))
+            self.rate = max(self.rate / 2 ** steps, self._min_rate)
+            self._increase_at = now + self._interval
+            self._max_fill = 0.0
+            return
+
+        if fill > self._max_fill:
+            self._max_fill = fill
+
+        if self.rate == 1 or now < self._increase_at:
+            return
+
+        if self._max_fill <= self._threshold / 2:
+            self.rate = min(self.rate * 2, 1.0)
+        self._increase_at = now + self._interval
+        self._max_fill = 0.0
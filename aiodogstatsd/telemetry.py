@@ -0,0 +1,175 @@
+from typing import List, NamedTuple, Tuple
+
+from aiodogstatsd import typedefs
+
+__all__ = ("Stats", "Telemetry")
+
+
+_TTelemetryMetric = Tuple[
+    typedefs.MName, typedefs.MType, typedefs.MValue, typedefs.MTags
+]
+
+TELEMETRY_NAMESPACE = "aiodogstatsd.client"
+
+
+class Stats(NamedTuple):
+    metrics_enqueued: int
+    metrics_dropped_queue_full: int
+    metrics_dropped_send_error: int
+    metrics_dropped_closing: int
+    metrics_tags_collapsed: int
+    metrics_guard_evicted: int
+    packets_sent: int
+    packets_dropped: int
+    bytes_sent: int
+    pending_queue_high_water_mark: int
+    send_latency_max: float
+    send_latency_avg: float
+
+
+class Telemetry:
+    __slots__ = (
+        "metrics_enqueued",
+        "metrics_dropped_queue_full",
+        "metrics_dropped_send_error",
+        "metrics_dropped_closing",
+        "metrics_tags_collapsed",
+        "metrics_guard_evicted",
+        "packets_sent",
+        "packets_dropped",
+        "bytes_sent",
+        "pending_queue_high_water_mark",
+        "send_latency_max",
+        "send_latency_sum",
+        "send_latency_count",
+        "_flushed",
+        "_interval_high_water_mark",
+        "_interval_send_latency_max",
+    )
+
+    def __init__(self) -> None:
+        """
+        Collect client's own counters, counters are updated by the client directly to
+        keep the overhead low.
+        """
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Zero counters in place, so everyone holding the telemetry sees it.
+        """
+        self.metrics_enqueued = 0
+        self.metrics_dropped_queue_full = 0
+        self.metrics_dropped_send_error = 0
+        self.metrics_dropped_closing = 0
+        self.metrics_tags_collapsed = 0
+        self.metrics_guard_evicted = 0
+        self.packets_sent = 0
+        self.packets_dropped = 0
+        self.bytes_sent = 0
+        self.pending_queue_high_water_mark = 0
+        self.send_latency_max = 0.0
+        self.send_latency_sum = 0.0
+        self.send_latency_count = 0
+
+        self._flushed = self.stats()
+        self._interval_high_water_mark = 0
+        self._interval_send_latency_max = 0.0
+
+    def observe_pending_queue_size(self, size: int) -> None:
+        if size > self._interval_high_water_mark:
+            self._interval_high_water_mark = size
+            if size > self.pending_queue_high_water_mark:
+                self.pending_queue_high_water_mark = size
+
+    def observe_send_latency(self, latency: float) -> None:
+        self.send_latency_sum += latency
+        self.send_latency_count += 1
+        if latency > self._interval_send_latency_max:
+            self._interval_send_latency_max = latency
+            if latency > self.send_latency_max:
+                self.send_latency_max = latency
+
+    def stats(self) -> Stats:
+        return Stats(
+            metrics_enqueued=self.metrics_enqueued,
+            metrics_dropped_queue_full=self.metrics_dropped_queue_full,
+            metrics_dropped_send_error=self.metrics_dropped_send_error,
+            metrics_dropped_closing=self.metrics_dropped_closing,
+            metrics_tags_collapsed=self.metrics_tags_collapsed,
+            metrics_guard_evicted=self.metrics_guard_evicted,
+            packets_sent=self.packets_sent,
+            packets_dropped=self.packets_dropped,
+            bytes_sent=self.bytes_sent,
+            pending_queue_high_water_mark=self.pending_queue_high_water_mark,
+            send_latency_max=self.send_latency_max,
+            send_latency_avg=(
+                self.send_latency_sum / self.send_latency_count
+                if self.send_latency_count
+                else 0.0
+            ),
+        )
+
+    def flush(self) -> List[_TTelemetryMetric]:
+        """
+        Build telemetry metrics for the interval since the previous flush, counters
+        are sent as deltas.
+        """
+        stats, flushed = self.stats(), self._flushed
+        self._flushed = stats
+
+        def counter(name: str, value: int, tags: typedefs.MTags) -> _TTelemetryMetric:
+            return (
+                f"{TELEMETRY_NAMESPACE}.{name}",
+                typedefs.MType.COUNTER,
+                value,
+                tags,
+            )
+
+        def gauge(name: str, value: typedefs.MValue) -> _TTelemetryMetric:
+            return (f"{TELEMETRY_NAMESPACE}.{name}", typedefs.MType.GAUGE, value, {})
+
+        metrics = [
+            counter(
+                "metrics_enqueued",
+                stats.metrics_enqueued - flushed.metrics_enqueued,
+                {},
+            ),
+            counter(
+                "metrics_dropped",
+                stats.metrics_dropped_queue_full - flushed.metrics_dropped_queue_full,
+                {"reason": "queue_full"},
+            ),
+            counter(
+                "metrics_dropped",
+                stats.metrics_dropped_send_error - flushed.metrics_dropped_send_error,
+                {"reason": "send_error"},
+            ),
+            counter(
+                "metrics_dropped",
+                stats.metrics_dropped_closing - flushed.metrics_dropped_closing,
+                {"reason": "closing"},
+            ),
+            counter(
+                "metrics_tags_collapsed",
+                stats.metrics_tags_collapsed - flushed.metrics_tags_collapsed,
+                {},
+            ),
+            counter(
+                "metrics_guard_evicted",
+                stats.metrics_guard_evicted - flushed.metrics_guard_evicted,
+                {},
+            ),
+            counter("packets_sent", stats.packets_sent - flushed.packets_sent, {}),
+            counter(
+                "packets_dropped", stats.packets_dropped - flushed.packets_dropped, {}
+            ),
+            counter("bytes_sent", stats.bytes_sent - flushed.bytes_sent, {}),
+            gauge("pending_queue_high_water_mark", self._interval_high_water_mark),
+            gauge("send_latency_max", round(self._interval_send_latency_max * 1000, 3)),
+        ]
+
+        self._interval_high_water_mark = 0
+        self._interval_send_latency_max = 0.0
+
+        return metrics
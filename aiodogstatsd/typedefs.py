@@ -38,3 +38,4 @@ class CState(enum.IntEnum):
     CONNECTED = enum.auto()
     CLOSING = enum.auto()
     DISCONNECTED = enum.auto()
+    FORKED = enum.auto()
@@ -0,0 +1,97 @@
+"""
+Run benchmarks and optionally store results as JSON to compare them between commits.
+
+    $ python -m benchmarks
+    $ python -m benchmarks protocol client --output before.json
+    $ python -m benchmarks --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import (  # noqa: F401
+    bench_client,
+    bench_contrib,
+    bench_e2e,
+    bench_protocol,
+    bench_threads,
+)
+from .suite import benchmarks
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load(path: str) -> Dict[Tuple[str, str], float]:
+    with open(path) as f:
+        report = json.load(f)
+
+    return {
+        (result["benchmark"], result["name"]): result["value"]
+        for result in report["results"]
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "filters", nargs="*", help="run benchmarks which names contain any of filters"
+    )
+    parser.add_argument("--output", help="store results to JSON file")
+    parser.add_argument("--compare", help="compare results with JSON file")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    selected = {
+        name: func
+        for name, func in benchmarks().items()
+        if not args.filters or any(f in name for f in args.filters)
+    }
+    if args.list:
+        print("\n".join(selected))
+        return
+
+    baseline = _load(args.compare) if args.compare else {}
+
+    results: List[Dict[str, Any]] = []
+    for name, func in selected.items():
+        for result in asyncio.run(func()):
+            results.append({"benchmark": name, **result._asdict()})
+
+            line = f"{name:<40} {result.name:<40} {result.value:>16.2f} {result.unit}"
+            previous = baseline.get((name, result.name))
+            if previous:
+                line += f" ({(result.value - previous) / previous * 100:+.1f}%)"
+            print(line, flush=True)
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": _commit(),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "timestamp": time.time(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
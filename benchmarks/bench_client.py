@@ -0,0 +1,241 @@
+import array
+import asyncio
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, List
+
+import aiodogstatsd
+from aiodogstatsd import typedefs
+
+from .sink import UDPSink
+from .suite import Result, benchmark, measure, percentiles
+
+NUMBER = 20_000
+BATCH_SIZE = 10_000
+LATENCY_SAMPLES = 50_000
+TAGS: typedefs.MTags = {"method": "GET", "status": 200}
+
+
+async def _drain(client: aiodogstatsd.Client) -> None:
+    # Let the listener send enqueued metrics, so the pending queue never overflows
+    while client._pending_queue:
+        await asyncio.sleep(0)
+
+
+@benchmark
+async def report() -> List[Result]:
+    results = []
+
+    async with UDPSink() as sink:
+        for sample_rate in (1, 0.5):
+            async with aiodogstatsd.Client(
+                host="127.0.0.1",
+                port=sink.port,
+                constant_tags={"service": "benchmark"},
+                sample_rate=sample_rate,
+                pending_queue_size=2 ** 20,
+            ) as client:
+                value = measure(
+                    lambda: client.increment("benchmark", tags=TAGS), number=NUMBER
+                )
+                await _drain(client)
+
+            results.append(Result(f"sample_rate={sample_rate}", 1e9 / value, "calls/s"))
+
+    return results
+
+
+@benchmark
+async def report_handle() -> List[Result]:
+    async with UDPSink() as sink:
+        async with aiodogstatsd.Client(
+            host="127.0.0.1",
+            port=sink.port,
+            constant_tags={"service": "benchmark"},
+            pending_queue_size=2 ** 20,
+        ) as client:
+            handle = client.handle("benchmark", tags=TAGS)
+            value = measure(handle.increment, number=NUMBER)
+            await _drain(client)
+
+    return [Result("sample_rate=1", 1e9 / value, "calls/s")]
+
+
+@benchmark
+async def submit_many() -> List[Result]:
+    results = []
+    values = array.array("d", (random.random() * 1000 for _ in range(BATCH_SIZE)))
+
+    async with UDPSink() as sink:
+        for sample_rate in (1, 0.1):
+            async with aiodogstatsd.Client(
+                host="127.0.0.1",
+                port=sink.port,
+                constant_tags={"service": "benchmark"},
+                pending_queue_size=2 ** 20,
+            ) as client:
+
+                def one_by_one(sample_rate: float = sample_rate) -> None:
+                    for value in values:
+                        client.histogram(
+                            "benchmark", value=value, tags=TAGS, sample_rate=sample_rate
+                        )
+
+                def at_once(sample_rate: float = sample_rate) -> None:
+                    client.submit_many(
+                        "benchmark",
+                        values,
+                        type_=aiodogstatsd.MType.HISTOGRAM,
+                        tags=TAGS,
+                        sample_rate=sample_rate,
+                    )
+
+                for name, func in (("one_by_one", one_by_one), ("at_once", at_once)):
+                    value = measure(func, number=1)
+                    await _drain(client)
+
+                    results.append(
+                        Result(
+                            f"{name},sample_rate={sample_rate}",
+                            BATCH_SIZE * 1e9 / value,
+                            "values/s",
+                        )
+                    )
+
+    return results
+
+
+@benchmark
+async def flush_buffer() -> List[Result]:
+    results = []
+    small_line = b"benchmark:1|c|#service:benchmark,method:GET,status:200"
+    # Datagrams of ~1.4KB as over UDP and of ~64KB as over Unix domain socket
+    # with a large `max_packet_size`
+    cases = (
+        ("small", [small_line] * 24),
+        ("large", [small_line.ljust(1000, b"0")] * 64),
+    )
+
+    async with UDPSink() as sink:
+        for case, lines in cases:
+            for scatter_gather in (False, True):
+                async with aiodogstatsd.Client(
+                    host="127.0.0.1",
+                    port=sink.port,
+                    buffered=True,
+                    scatter_gather=scatter_gather,
+                ) as client:
+
+                    def flush(lines: List[bytes] = lines) -> None:
+                        client._buffer.extend(lines)
+                        client._flush_buffer()
+
+                    value = measure(flush, number=NUMBER)
+
+                results.append(
+                    Result(f"{case},scatter_gather={scatter_gather}", value, "ns/op")
+                )
+
+    return results
+
+
+@contextmanager
+def _timeit_contextmanager(
+    client: aiodogstatsd.Client, name: str, **kwargs
+) -> Iterator[None]:
+    # Implementation of `.timeit()` used before 0.17.0, kept for comparison
+    loop = asyncio.get_event_loop()
+    started_at = loop.time()
+    try:
+        yield
+    finally:
+        value = (loop.time() - started_at) * 1000
+        client.timing(name, value=int(value), **kwargs)
+
+
+@benchmark
+async def timeit() -> List[Result]:
+    async with UDPSink() as sink:
+        async with aiodogstatsd.Client(
+            host="127.0.0.1",
+            port=sink.port,
+            constant_tags={"service": "benchmark"},
+            pending_queue_size=2 ** 20,
+        ) as client:
+
+            def contextmanager() -> None:
+                with _timeit_contextmanager(client, "benchmark", tags=TAGS):
+                    pass
+
+            def timer() -> None:
+                with client.timeit("benchmark", tags=TAGS):
+                    pass
+
+            @client.timed("benchmark", tags=TAGS)
+            def decorated() -> None:
+                pass
+
+            results = []
+            for name, func in (
+                ("contextmanager", contextmanager),
+                ("timer", timer),
+                ("decorator", decorated),
+            ):
+                value = measure(func, number=NUMBER)
+                await _drain(client)
+                results.append(Result(name, value, "ns/op"))
+
+    return results
+
+
+@benchmark
+async def report_latency() -> List[Result]:
+    samples = []
+
+    async with UDPSink() as sink:
+        async with aiodogstatsd.Client(
+            host="127.0.0.1",
+            port=sink.port,
+            constant_tags={"service": "benchmark"},
+            pending_queue_size=2 ** 20,
+        ) as client:
+            perf_counter_ns = time.perf_counter_ns
+            for i in range(LATENCY_SAMPLES):
+                started_at = perf_counter_ns()
+                client.increment("benchmark", tags=TAGS)
+                samples.append(perf_counter_ns() - started_at)
+                if i % 1000 == 0:
+                    await _drain(client)
+
+    return [
+        Result(f"p{quantile}", value, "ns")
+        for quantile, value in percentiles(samples, (50, 90, 99, 999)).items()
+    ]
+
+
+@benchmark
+async def pending_queue_memory() -> List[Result]:
+    async with UDPSink() as sink:
+        client = aiodogstatsd.Client(
+            host="127.0.0.1", port=sink.port, constant_tags={"service": "benchmark"}
+        )
+        await client.connect()
+
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            # Listener doesn't run until we yield, so the pending queue gets full
+            pending_queue_size = client._pending_queue_size
+            for i in range(pending_queue_size):
+                client.increment("benchmark", tags={"id": i % 1024})
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        await client.close()
+
+    return [
+        Result(f"pending_queue_size={pending_queue_size}", after - before, "bytes"),
+    ]
@@ -0,0 +1,91 @@
+import asyncio
+import socket
+import time
+from typing import Any, Dict, List
+
+import aiodogstatsd
+
+from .sink import UDPSink
+from .suite import Result, benchmark, percentiles
+
+METRICS = 200_000
+CHUNK = 1_000
+LATENCY_SAMPLES = 5_000
+
+
+async def _run(sink: UDPSink, **kwargs) -> List[Result]:
+    await sink.reset()
+
+    async with aiodogstatsd.Client(
+        host="127.0.0.1",
+        port=sink.port,
+        constant_tags={"service": "benchmark"},
+        **kwargs,
+    ) as client:
+        started_at = time.perf_counter()
+        for _ in range(METRICS // CHUNK):
+            for _ in range(CHUNK):
+                client.increment("benchmark", tags={"method": "GET"})
+            # Give the listener a chance to send metrics like a real application does
+            await asyncio.sleep(0)
+
+        sent_at = time.perf_counter()
+
+    packets, metrics, _ = await sink.wait(METRICS)
+    duration = sent_at - started_at
+
+    prefix = ",".join(f"{key}={value}" for key, value in kwargs.items()) or "default"
+    return [
+        Result(f"{prefix}:metrics", metrics / duration, "metrics/s"),
+        Result(f"{prefix}:packets", packets / duration, "packets/s"),
+        Result(f"{prefix}:received", metrics / METRICS * 100, "%"),
+    ]
+
+
+@benchmark
+async def throughput() -> List[Result]:
+    async with UDPSink() as sink:
+        return [
+            *await _run(sink),
+            *await _run(sink, buffered=True),
+            *await _run(sink, buffered=True, scatter_gather=True),
+            *await _run(sink, direct_send=True),
+        ]
+
+
+@benchmark
+async def delivery_latency() -> List[Result]:
+    results: List[Result] = []
+
+    # Datagrams are read in the same process to see when they leave the client
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.setblocking(False)
+
+    variants: List[Dict[str, Any]] = [{}, {"direct_send": True}]
+    for kwargs in variants:
+        samples = []
+        async with aiodogstatsd.Client(
+            host="127.0.0.1", port=sock.getsockname()[1], **kwargs
+        ) as client:
+            perf_counter_ns = time.perf_counter_ns
+            for _ in range(LATENCY_SAMPLES):
+                started_at = perf_counter_ns()
+                client.increment("benchmark", tags={"method": "GET"})
+                while True:
+                    try:
+                        sock.recv(65535)
+                        break
+                    except BlockingIOError:
+                        await asyncio.sleep(0)
+                samples.append(perf_counter_ns() - started_at)
+
+        prefix = ",".join(f"{key}={value}" for key, value in kwargs.items())
+        results.extend(
+            Result(f"{prefix or 'default'}:p{quantile}", value, "ns")
+            for quantile, value in percentiles(samples, (50, 99)).items()
+        )
+
+    sock.close()
+
+    return results
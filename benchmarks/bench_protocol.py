@@ -0,0 +1,63 @@
+from typing import List
+
+from aiodogstatsd import protocol, typedefs
+
+from .suite import Result, benchmark, measure
+
+NUMBER = 20_000
+CONSTANT_TAGS_COUNT = 2
+
+
+def _tags(count: int) -> typedefs.MTags:
+    return {f"tag_key_{i}": f"tag_value_{i}" for i in range(count)}
+
+
+@benchmark
+async def build() -> List[Result]:
+    results = []
+    constant_tags = _tags(CONSTANT_TAGS_COUNT)
+    for count in (0, 1, 4, 16):
+        tags = _tags(count)
+
+        # Constant tags are merged on every call like the client did before caching
+        def build_metric(tags: typedefs.MTags = tags) -> bytes:
+            return protocol.build(
+                name="benchmark",
+                namespace="namespace",
+                value=42,
+                type_=typedefs.MType.COUNTER,
+                tags={**constant_tags, **tags},
+                sample_rate=1,
+            )
+
+        value = measure(build_metric, number=NUMBER)
+        results.append(Result(f"tags={count}", value, "ns/op"))
+
+    return results
+
+
+@benchmark
+async def builder() -> List[Result]:
+    results = []
+    constant_tags = _tags(CONSTANT_TAGS_COUNT)
+    for count in (0, 1, 4, 16):
+        builder = protocol.Builder(
+            namespace="namespace", constant_tags=constant_tags, cache_size=1024
+        )
+        tags = _tags(count)
+
+        def build_metric(
+            builder: protocol.Builder = builder, tags: typedefs.MTags = tags
+        ) -> bytes:
+            return builder.build(
+                name="benchmark",
+                value=42,
+                type_=typedefs.MType.COUNTER,
+                tags=tags,
+                sample_rate=1,
+            )
+
+        value = measure(build_metric, number=NUMBER)
+        results.append(Result(f"tags={count}", value, "ns/op"))
+
+    return results
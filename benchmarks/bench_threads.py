@@ -0,0 +1,76 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import aiodogstatsd
+
+from .sink import UDPSink
+from .suite import Result, benchmark
+
+METRICS = 50_000
+THREADS = 4
+
+
+def _report(client: aiodogstatsd.Client, count: int) -> float:
+    started_at = time.perf_counter_ns()
+    for _ in range(count):
+        client.increment("benchmark", tags={"thread": "worker"})
+    return (time.perf_counter_ns() - started_at) / count
+
+
+def _report_call_soon_threadsafe(
+    client: aiodogstatsd.Client, loop: asyncio.AbstractEventLoop, count: int
+) -> float:
+    started_at = time.perf_counter_ns()
+    for _ in range(count):
+        loop.call_soon_threadsafe(
+            lambda: client.increment("benchmark", tags={"thread": "worker"})
+        )
+    return (time.perf_counter_ns() - started_at) / count
+
+
+@benchmark
+async def report_from_threads() -> List[Result]:
+    loop = asyncio.get_event_loop()
+
+    async with UDPSink() as sink:
+        async with aiodogstatsd.Client(
+            host="127.0.0.1", port=sink.port, pending_queue_size=2 ** 20
+        ) as client:
+            results = [Result("event_loop_thread", _report(client, METRICS), "ns/op")]
+            await asyncio.sleep(0.1)
+
+            with ThreadPoolExecutor(max_workers=THREADS) as executor:
+                values = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(executor, _report, client, METRICS)
+                        for _ in range(THREADS)
+                    )
+                )
+                results.append(
+                    Result(f"threads={THREADS}", sum(values) / len(values), "ns/op")
+                )
+                await asyncio.sleep(0.1)
+
+                values = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(
+                            executor,
+                            _report_call_soon_threadsafe,
+                            client,
+                            loop,
+                            METRICS,
+                        )
+                        for _ in range(THREADS)
+                    )
+                )
+                results.append(
+                    Result(
+                        f"threads={THREADS},call_soon_threadsafe",
+                        sum(values) / len(values),
+                        "ns/op",
+                    )
+                )
+
+    return results
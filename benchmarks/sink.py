@@ -0,0 +1,102 @@
+import asyncio
+import multiprocessing
+import socket
+from multiprocessing.connection import Connection
+from typing import Any, Optional, Tuple
+
+__all__ = ("UDPSink",)
+
+
+# Pipe is checked for commands on timeout or every N packets to keep receiving fast
+_POLL_EVERY = 256
+
+
+def _serve(conn: Connection) -> None:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 ** 24)
+    except OSError:  # pragma: no cover
+        pass
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.01)
+    conn.send(sock.getsockname()[1])
+
+    packets = metrics = bytes_ = 0
+    while True:
+        for _ in range(_POLL_EVERY):
+            try:
+                data = sock.recv(65535)
+            except socket.timeout:
+                break
+
+            packets += 1
+            metrics += data.count(b"\n") + 1
+            bytes_ += len(data)
+
+        while conn.poll():
+            command = conn.recv()
+            if command == "stats":
+                conn.send((packets, metrics, bytes_))
+            elif command == "reset":
+                packets = metrics = bytes_ = 0
+            else:
+                sock.close()
+                return
+
+
+class UDPSink:
+    __slots__ = ("port", "_process", "_conn")
+
+    def __init__(self) -> None:
+        """
+        Local UDP server running in a separate process, it only counts received
+        packets, metrics and bytes, so it doesn't compete with the benchmarked code.
+        """
+        self.port = 0
+
+        self._process: Optional[Any] = None
+        self._conn: Optional[Connection] = None
+
+    async def __aenter__(self) -> "UDPSink":
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child_conn,), daemon=True)
+        self._process.start()
+
+        self.port = await self._recv()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        assert self._conn is not None and self._process is not None
+        self._conn.send("stop")
+        self._process.join()
+
+    async def stats(self) -> Tuple[int, int, int]:
+        """
+        Return received packets, metrics and bytes.
+        """
+        assert self._conn is not None
+        self._conn.send("stats")
+        return await self._recv()
+
+    async def reset(self) -> None:
+        assert self._conn is not None
+        self._conn.send("reset")
+
+    async def wait(self, metrics: int, *, timeout: float = 5.0) -> Tuple[int, int, int]:
+        """
+        Wait until `metrics` are received or `timeout` is reached, return received
+        packets, metrics and bytes.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while True:
+            stats = await self.stats()
+            if stats[1] >= metrics or loop.time() >= deadline:
+                return stats
+            await asyncio.sleep(0.01)
+
+    async def _recv(self) -> Any:
+        assert self._conn is not None
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._conn.recv)
@@ -0,0 +1,104 @@
+import gc
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Sequence,
+)
+
+__all__ = (
+    "Result",
+    "benchmark",
+    "benchmarks",
+    "measure",
+    "measure_async",
+    "percentiles",
+)
+
+
+class Result(NamedTuple):
+    name: str
+    value: float
+    unit: str
+
+
+_TBenchmark = Callable[[], Coroutine[Any, Any, List[Result]]]
+
+_benchmarks: Dict[str, _TBenchmark] = {}
+
+
+def benchmark(func: _TBenchmark) -> _TBenchmark:
+    """
+    Register a benchmark, it's a coroutine function returning a list of results.
+    """
+    module = func.__module__.rsplit(".", 1)[-1]
+    if module.startswith("bench_"):
+        module = module[len("bench_") :]
+
+    _benchmarks[f"{module}.{func.__name__}"] = func
+    return func
+
+
+def benchmarks() -> Dict[str, _TBenchmark]:
+    return dict(_benchmarks)
+
+
+def measure(func: Callable[[], object], *, number: int, repeat: int = 5) -> float:
+    """
+    Return the best time in nanoseconds per single `func` call, `func` is called
+    `number` times per repeat.
+    """
+    best = float("inf")
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started_at = time.perf_counter_ns()
+            for _ in range(number):
+                func()
+            best = min(best, (time.perf_counter_ns() - started_at) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return best
+
+
+async def measure_async(
+    func: Callable[[], Awaitable[object]], *, number: int, repeat: int = 5
+) -> float:
+    """
+    Same as `measure`, but `func` returns an awaitable.
+    """
+    best = float("inf")
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started_at = time.perf_counter_ns()
+            for _ in range(number):
+                await func()
+            best = min(best, (time.perf_counter_ns() - started_at) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return best
+
+
+def percentiles(
+    samples: Sequence[float], quantiles: Iterable[int] = (50, 90, 99)
+) -> Dict[int, float]:
+    ordered = sorted(samples)
+    return {
+        quantile: ordered[min(len(ordered) - 1, len(ordered) * quantile // 100)]
+        for quantile in quantiles
+    }
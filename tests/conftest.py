@@ -1,4 +1,7 @@
 import asyncio
+import os
+import socket
+import tempfile
 from typing import List
 
 import pytest
@@ -19,6 +22,45 @@ async def statsd_server(udp_server_factory, unused_udp_port):
     yield udp_server, collected
 
 
+class UDSServer:
+    __slots__ = ("_path", "_protocol", "_transport")
+
+    def __init__(self, *, path: str, protocol) -> None:
+        self._path = path
+        self._protocol = protocol
+        self._transport = None
+
+    async def __aenter__(self):
+        loop = asyncio.get_event_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            self._protocol, local_addr=self._path, family=socket.AF_UNIX
+        )
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._transport.close()
+        self._transport = None
+        os.unlink(self._path)
+
+
+@pytest.fixture
+def unused_socket_path():
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "dsd.socket")
+
+
+@pytest.fixture
+async def statsd_uds_server(unused_socket_path):
+    collected = []
+
+    class ServerProtocol(asyncio.DatagramProtocol):
+        def datagram_received(self, data, addr):
+            collected.append(data)
+
+    uds_server = UDSServer(path=unused_socket_path, protocol=ServerProtocol)
+
+    yield uds_server, collected
+
+
 @pytest.fixture
 def wait_for():
     async def _wait_for(
@@ -0,0 +1,113 @@
+import pytest
+
+from aiodogstatsd import typedefs
+from aiodogstatsd.aggregator import Aggregator
+
+
+def test_aggregate():
+    aggregator = Aggregator(
+        namespace=None, max_contexts=8, max_samples_per_context=8, max_line_size=1432
+    )
+
+    assert aggregator.add("counter", typedefs.MType.COUNTER, 1, "")
+    assert aggregator.add("counter", typedefs.MType.COUNTER, 2, "")
+    assert aggregator.add("counter", typedefs.MType.COUNTER, 5, "and:robin")
+    assert aggregator.add("gauge", typedefs.MType.GAUGE, 1, "")
+    assert aggregator.add("gauge", typedefs.MType.GAUGE, 42, "")
+
+    assert aggregator.flush() == [
+        b"counter:3|c",
+        b"counter:5|c|#and:robin",
+        b"gauge:42|g",
+    ]
+    assert aggregator.flush() == []
+
+
+def test_aggregate_namespace():
+    aggregator = Aggregator(
+        namespace="namespace",
+        max_contexts=8,
+        max_samples_per_context=8,
+        max_line_size=1432,
+    )
+
+    aggregator.add("counter", typedefs.MType.COUNTER, 1, "")
+
+    assert aggregator.flush() == [b"namespace.counter:1|c"]
+
+
+def test_max_contexts():
+    aggregator = Aggregator(
+        namespace=None, max_contexts=1, max_samples_per_context=8, max_line_size=1432
+    )
+
+    assert aggregator.add("counter", typedefs.MType.COUNTER, 1, "")
+    assert aggregator.add("counter", typedefs.MType.COUNTER, 1, "")
+    assert not aggregator.add("gauge", typedefs.MType.GAUGE, 42, "")
+
+    assert aggregator.flush() == [b"counter:2|c"]
+    assert aggregator.add("gauge", typedefs.MType.GAUGE, 42, "")
+
+
+def test_samples():
+    aggregator = Aggregator(
+        namespace=None, max_contexts=8, max_samples_per_context=8, max_line_size=1432
+    )
+
+    assert aggregator.add_sample("histogram", typedefs.MType.HISTOGRAM, 1, "", 1)
+    assert aggregator.add_sample("histogram", typedefs.MType.HISTOGRAM, 2, "", 1)
+    assert aggregator.add_sample("timing", typedefs.MType.TIMING, 3, "and:robin", 0.5)
+
+    assert aggregator.flush() == [
+        b"histogram:1:2|h",
+        b"timing:3|ms|@0.5|#and:robin",
+    ]
+    assert aggregator.flush() == []
+
+
+def test_samples_split_by_max_line_size():
+    aggregator = Aggregator(
+        namespace=None, max_contexts=8, max_samples_per_context=8, max_line_size=12
+    )
+
+    for value in range(5):
+        aggregator.add_sample("dist", typedefs.MType.DISTRIBUTION, value, "", 1)
+
+    assert aggregator.flush() == [b"dist:0:1:2|d", b"dist:3:4|d"]
+
+
+def test_samples_reservoir(mocker):
+    mocker.patch("aiodogstatsd.aggregator.randrange", side_effect=[0, 3])
+    aggregator = Aggregator(
+        namespace=None, max_contexts=8, max_samples_per_context=2, max_line_size=1432
+    )
+
+    for value in range(4):
+        aggregator.add_sample("histogram", typedefs.MType.HISTOGRAM, value, "", 0.5)
+
+    # 2 samples of 4 are kept, so sample rate is reduced twice
+    assert aggregator.flush() == [b"histogram:2:1|h|@0.25"]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_samples_reservoir_is_bounded(seed):
+    aggregator = Aggregator(
+        namespace=None, max_contexts=8, max_samples_per_context=16, max_line_size=1432
+    )
+
+    for value in range(1000):
+        aggregator.add_sample("histogram", typedefs.MType.HISTOGRAM, value, "", 1)
+
+    (metric,) = aggregator.flush()
+    values, tail = metric.split(b"|", 1)
+    assert len(values.split(b":")) == 17
+    assert tail == b"h|@0.016"
+
+
+def test_samples_max_contexts():
+    aggregator = Aggregator(
+        namespace=None, max_contexts=1, max_samples_per_context=8, max_line_size=1432
+    )
+
+    assert aggregator.add("counter", typedefs.MType.COUNTER, 1, "")
+    assert not aggregator.add_sample("histogram", typedefs.MType.HISTOGRAM, 1, "", 1)
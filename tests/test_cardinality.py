@@ -0,0 +1,45 @@
+from aiodogstatsd.cardinality import OVERFLOW_TAG_VALUE, CardinalityGuard
+from aiodogstatsd.telemetry import Telemetry
+
+
+def test_check():
+    telemetry = Telemetry()
+    guard = CardinalityGuard(
+        max_contexts_per_metric=2, max_metrics=8, telemetry=telemetry
+    )
+
+    assert guard.check("name", {"method": "GET", "request_id": 1}) is None
+    assert guard.check("name", {"method": "POST", "request_id": 2}) is None
+    assert guard.check("name", {"method": "GET", "request_id": 1}) is None
+    # Order of tags doesn't matter
+    assert guard.check("name", {"request_id": 2, "method": "POST"}) is None
+    # Limit is per metric name
+    assert guard.check("other", {"method": "GET", "request_id": 3}) is None
+
+    collapsed = {"method": OVERFLOW_TAG_VALUE, "request_id": OVERFLOW_TAG_VALUE}
+    assert guard.check("name", {"method": "GET", "request_id": 3}) == collapsed
+    assert guard.check("name", {"method": "PUT", "request_id": 4}) == collapsed
+    # Combinations of known values count against the limit too
+    assert guard.check("name", {"method": "POST", "request_id": 1}) == collapsed
+    assert guard.check("name", collapsed) is None
+
+    assert telemetry.metrics_tags_collapsed == 3
+
+
+def test_check_max_metrics():
+    telemetry = Telemetry()
+    guard = CardinalityGuard(
+        max_contexts_per_metric=1, max_metrics=2, telemetry=telemetry
+    )
+
+    assert guard.check("first", {"request_id": 1}) is None
+    assert guard.check("second", {"request_id": 1}) is None
+    # Recently checked metric isn't evicted
+    assert guard.check("first", {"request_id": 1}) is None
+    assert guard.check("third", {"request_id": 1}) is None
+    assert telemetry.metrics_guard_evicted == 1
+
+    assert guard.check("first", {"request_id": 2}) == {"request_id": OVERFLOW_TAG_VALUE}
+    # Evicted metric starts over
+    assert guard.check("second", {"request_id": 2}) is None
+    assert telemetry.metrics_guard_evicted == 2
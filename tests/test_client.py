@@ -1,8 +1,15 @@
+import array
 import asyncio
+import os
+import socket
+import sys
+import time
 
 import pytest
 
 import aiodogstatsd
+from aiodogstatsd.client import DatagramProtocol
+from aiodogstatsd.collectors import Collector, Metric
 
 pytestmark = pytest.mark.asyncio
 
@@ -90,49 +97,207 @@ class TestClient:
         assert collected == [b"test_timing:42|ms|#whoami:batman,and:robin"]
 
     async def test_skip_if_sample_rate(self, mocker, statsd_client_samplerate):
-        mocked_queue = mocker.patch.object(statsd_client_samplerate, "_pending_queue")
+        pending_queue = statsd_client_samplerate._pending_queue
 
         statsd_client_samplerate.increment("test_sample_rate_1", sample_rate=1)
-        mocked_queue.put_nowait.assert_called_once_with(
-            b"test_sample_rate_1:1|c|#whoami:batman"
-        )
+        assert list(pending_queue) == [b"test_sample_rate_1:1|c|#whoami:batman"]
 
         mocker.patch("aiodogstatsd.client.random", return_value=1)
         statsd_client_samplerate.increment("test_sample_rate_2", sample_rate=0.5)
-        mocked_queue.put_nowait.assert_called_once_with(
-            b"test_sample_rate_1:1|c|#whoami:batman"
-        )
+        assert list(pending_queue) == [b"test_sample_rate_1:1|c|#whoami:batman"]
 
-        mocked_queue.put_nowait.reset_mock()
+        pending_queue.clear()
         mocker.patch("aiodogstatsd.client.random", return_value=0.4)
         statsd_client_samplerate.increment("test_sample_rate_4")
-        mocked_queue.put_nowait.assert_not_called()
+        assert list(pending_queue) == []
+
+    async def test_submit_many(self, statsd_client, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client.submit_many(
+                "test_histogram",
+                array.array("d", [0.5, 1.5]),
+                type_=aiodogstatsd.MType.HISTOGRAM,
+                tags={"and": "robin"},
+            )
+            statsd_client.submit_many(
+                "test_counter", (1, 2, 3), type_=aiodogstatsd.MType.COUNTER
+            )
+            statsd_client.submit_many(
+                "test_gauge", iter([1, 2, 3]), type_=aiodogstatsd.MType.GAUGE
+            )
+            statsd_client.submit_many(
+                "test_timing", [], type_=aiodogstatsd.MType.TIMING
+            )
+            await wait_for(collected, count=3)
+
+        assert collected == [
+            b"test_histogram:0.5:1.5|h|#whoami:batman,and:robin",
+            b"test_counter:6|c|#whoami:batman",
+            b"test_gauge:3|g|#whoami:batman",
+        ]
+
+    async def test_submit_many_split_by_max_packet_size(self, unused_udp_port):
+        async with aiodogstatsd.Client(
+            host="0.0.0.0", port=unused_udp_port, max_packet_size=1000
+        ) as statsd_client:
+            statsd_client.submit_many(
+                "test_distribution",
+                range(1000),
+                type_=aiodogstatsd.MType.DISTRIBUTION,
+            )
+
+            pending_queue = list(statsd_client._pending_queue)
+            statsd_client._pending_queue.clear()
+
+        assert len(pending_queue) == 4
+        assert all(len(line) <= 1000 for line in pending_queue)
+        assert [
+            int(value)
+            for line in pending_queue
+            for value in line[len(b"test_distribution:") : -len(b"|d")].split(b":")
+        ] == list(range(1000))
+
+    async def test_submit_many_sample_rate(self, mocker, statsd_client):
+        pending_queue = statsd_client._pending_queue
+
+        # Every second value is kept
+        mocker.patch("aiodogstatsd.client.random", return_value=0.5)
+        statsd_client.submit_many(
+            "test_timing", range(10), type_=aiodogstatsd.MType.TIMING, sample_rate=0.5
+        )
+        assert list(pending_queue) == [b"test_timing:1:3:5:7:9|ms|@0.5|#whoami:batman"]
+
+        # Every third value is kept
+        pending_queue.clear()
+        statsd_client.submit_many(
+            "test_timing", range(10), type_=aiodogstatsd.MType.TIMING, sample_rate=0.25
+        )
+        assert list(pending_queue) == [b"test_timing:2:5:8|ms|@0.25|#whoami:batman"]
+
+    async def test_submit_many_aggregate(
+        self, unused_udp_port, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                aggregate=True,
+                extended_aggregation=True,
+            ) as statsd_client:
+                statsd_client.increment("test_counter")
+                statsd_client.submit_many(
+                    "test_counter", [1, 2], type_=aiodogstatsd.MType.COUNTER
+                )
+                statsd_client.submit_many(
+                    "test_timing", [1, 2], type_=aiodogstatsd.MType.TIMING
+                )
+            await wait_for(collected, count=2)
+
+        assert sorted(collected) == [b"test_counter:4|c", b"test_timing:1:2|ms"]
+
+    async def test_header_cache_info(self, statsd_client):
+        statsd_client.increment("test_increment", tags={"and": "robin"})
+        statsd_client.increment("test_increment", tags={"and": "robin"})
+        statsd_client.increment("test_increment", tags={"and": "alfred"})
+
+        cache_info = statsd_client.header_cache_info()
+        assert cache_info.hits == 1
+        assert cache_info.misses == 2
+        assert cache_info.currsize == 2
 
     async def test_message_send_on_close(self, mocker):
         statsd_client = aiodogstatsd.Client()
         await statsd_client.connect()
 
-        mocked_queue = mocker.patch.object(statsd_client, "_pending_queue")
-        mocked_queue.empty = mocker.Mock()
-        mocked_queue.empty.side_effect = [0, 1]
-        mocked_queue.get = mocker.Mock()
-        mocked_queue.get.side_effect = asyncio.Future
+        mocked_send = mocker.patch("aiodogstatsd.client.DatagramProtocol.send")
+
+        await asyncio.sleep(0)
+        statsd_client.increment("test_increment_1")
+        statsd_client.increment("test_increment_2")
+        await statsd_client.close()
+
+        assert mocked_send.call_args_list == [
+            mocker.call(b"test_increment_1:1|c"),
+            mocker.call(b"test_increment_2:1|c"),
+        ]
+
+    async def test_send_pending_at_once(self, mocker, statsd_client):
+        mocked_send = mocker.patch("aiodogstatsd.client.DatagramProtocol.send")
+        mocked_wait_for = mocker.spy(asyncio, "wait_for")
 
         await asyncio.sleep(0)
-        mocked_queue.get.assert_called_once()
+        for _ in range(100):
+            statsd_client.increment("test_increment")
+        await asyncio.sleep(0.01)
+
+        assert mocked_send.call_count == 100
+        # Listener is woken up once for all enqueued metrics
+        assert mocked_wait_for.call_count == 1
+
+    async def test_skip_if_pending_queue_full(self, mocker):
+        statsd_client = aiodogstatsd.Client(pending_queue_size=2)
+        await statsd_client.connect()
+
+        mocked_send = mocker.patch("aiodogstatsd.client.DatagramProtocol.send")
+
+        for i in range(3):
+            statsd_client.increment(f"test_increment_{i}")
         await statsd_client.close()
 
-        assert mocked_queue.get.call_count == 2
-        assert mocked_queue.empty.call_count == 2
+        assert mocked_send.call_args_list == [
+            mocker.call(b"test_increment_0:1|c"),
+            mocker.call(b"test_increment_1:1|c"),
+        ]
 
-    async def test_skip_if_closing(self, mocker):
+    async def test_skip_if_closing(self):
         statsd_client = aiodogstatsd.Client()
         await statsd_client.connect()
         await statsd_client.close()
 
-        mocked_queue = mocker.patch.object(statsd_client, "_pending_queue")
         statsd_client.increment("test_closing")
-        mocked_queue.assert_not_called()
+        assert list(statsd_client._pending_queue) == []
+
+    async def test_report_from_thread(
+        self, mocker, statsd_client, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+        loop = asyncio.get_event_loop()
+        spy = mocker.spy(loop, "call_soon_threadsafe")
+
+        def report():
+            for _ in range(100):
+                statsd_client.increment("test_increment", tags={"and": "robin"})
+
+        async with udp_server:
+            await loop.run_in_executor(None, report)
+            await wait_for(collected, count=100)
+
+        assert collected == [b"test_increment:1|c|#whoami:batman,and:robin"] * 100
+        # Event loop is woken up once for a batch of metrics
+        assert spy.call_count < 100
+
+    async def test_report_from_thread_send_on_close(self, mocker):
+        statsd_client = aiodogstatsd.Client()
+        await statsd_client.connect()
+
+        mocked_send = mocker.patch("aiodogstatsd.client.DatagramProtocol.send")
+        handle = statsd_client.handle("test_handle")
+
+        def report():
+            statsd_client.increment("test_increment")
+            handle.increment()
+
+        await asyncio.get_event_loop().run_in_executor(None, report)
+        await statsd_client.close()
+
+        assert mocked_send.call_args_list == [
+            mocker.call(b"test_increment:1|c"),
+            mocker.call(b"test_handle:1|c"),
+        ]
 
     async def test_context_manager(self, unused_udp_port, statsd_server, wait_for):
         udp_server, collected = statsd_server
@@ -149,21 +314,95 @@ class TestClient:
     async def test_timeit(self, statsd_client, statsd_server, wait_for, mocker):
         udp_server, collected = statsd_server
 
-        loop = mocker.patch("aiodogstatsd.client.get_event_loop")
-        loop.return_value.time.return_value = 1.0
+        perf_counter_ns = mocker.patch("aiodogstatsd.client.perf_counter_ns")
+        perf_counter_ns.return_value = 1_000_000_000
         with statsd_client.timeit("test_timer", tags={"and": "robin"}):
-            loop.return_value.time.return_value = 2.0
+            perf_counter_ns.return_value = 2_000_250_999
 
         # This shouldn't be logged.
-        loop.return_value.time.return_value = 1.0
+        perf_counter_ns.return_value = 1_000_000_000
         with statsd_client.timeit(
             "test_timer", tags={"and": "robin"}, threshold_ms=3000.0
         ):
-            loop.return_value.time.return_value = 2.0
+            perf_counter_ns.return_value = 2_000_000_000
+
+        perf_counter_ns.return_value = 1_000_000_000
+        async with statsd_client.timeit("test_timer", tags={"and": "robin"}):
+            perf_counter_ns.return_value = 1_000_500_000
+
+        async with udp_server:
+            await wait_for(collected, count=2)
+        assert collected == [
+            b"test_timer:1000.25|ms|#whoami:batman,and:robin",
+            b"test_timer:0.5|ms|#whoami:batman,and:robin",
+        ]
+
+    async def test_timed(self, statsd_client, statsd_server, wait_for, mocker):
+        udp_server, collected = statsd_server
+
+        perf_counter_ns = mocker.patch("aiodogstatsd.client.perf_counter_ns")
+
+        def tick():
+            perf_counter_ns.return_value += 1_000_000
+
+        @statsd_client.timed("test_func")
+        def func(value):
+            tick()
+            return value
+
+        @statsd_client.timed("test_coro")
+        async def coro(value):
+            tick()
+            return value
+
+        @statsd_client.timed("test_gen")
+        def gen(value):
+            tick()
+            yield value
+
+        @statsd_client.timed("test_async_gen", threshold_ms=1)
+        async def async_gen(value):
+            tick()
+            yield value
+            tick()
+
+        perf_counter_ns.return_value = 0
+        assert func(1) == 1
+        assert await coro(2) == 2
+        assert list(gen(3)) == [3]
+        assert [value async for value in async_gen(4)] == [4]
+        assert func.__name__ == "func"
+
+        async with udp_server:
+            await wait_for(collected, count=4)
+        assert collected == [
+            b"test_func:1.0|ms|#whoami:batman",
+            b"test_coro:1.0|ms|#whoami:batman",
+            b"test_gen:1.0|ms|#whoami:batman",
+            b"test_async_gen:2.0|ms|#whoami:batman",
+        ]
+
+    async def test_timed_async_gen_asend(self, statsd_client, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        @statsd_client.timed("test_async_gen")
+        async def async_gen():
+            value = yield 1
+            try:
+                yield value
+            except ValueError:
+                yield "thrown"
+
+        agen = async_gen()
+        assert await agen.__anext__() == 1
+        assert await agen.asend("hello") == "hello"
+        assert await agen.athrow(ValueError()) == "thrown"
+        await agen.aclose()
 
         async with udp_server:
             await wait_for(collected)
-        assert collected == [b"test_timer:1000|ms|#whoami:batman,and:robin"]
+        assert len(collected) == 1
+        assert collected[0].startswith(b"test_async_gen:")
 
     async def test_timeit_task(self, statsd_client, statsd_server, wait_for, mocker):
         udp_server, collected = statsd_server
@@ -171,25 +410,961 @@ class TestClient:
         async def do_nothing():
             pass
 
-        loop = mocker.patch("aiodogstatsd.client.get_event_loop")
-        loop.return_value.create_task = asyncio.get_event_loop().create_task
+        perf_counter_ns = mocker.patch("aiodogstatsd.client.perf_counter_ns")
 
         # Metric will be sent
-        loop.return_value.time.return_value = 1.0
+        perf_counter_ns.return_value = 1_000_000_000
         task = statsd_client.timeit_task(
             do_nothing(), "test_timer", tags={"and": "robin"}, threshold_ms=500
         )
-        loop.return_value.time.return_value = 2.0
+        perf_counter_ns.return_value = 2_000_000_000
         await task
 
         # Metric wont be sent because of not meeting the threshold
-        loop.return_value.time.return_value = 1.0
+        perf_counter_ns.return_value = 1_000_000_000
         task = statsd_client.timeit_task(
             do_nothing(), "test_timer", tags={"and": "robin"}, threshold_ms=1100
         )
-        loop.return_value.time.return_value = 2.0
+        perf_counter_ns.return_value = 2_000_000_000
         await task
 
         async with udp_server:
             await wait_for(collected)
-        assert collected == [b"test_timer:1000|ms|#whoami:batman,and:robin"]
+        assert collected == [b"test_timer:1000.0|ms|#whoami:batman,and:robin"]
+
+
+class TestClientBuffered:
+    async def test_pack_into_datagram(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, buffered=True
+            ) as statsd_client:
+                statsd_client.increment("test_increment")
+                statsd_client.gauge("test_gauge", value=42)
+                statsd_client.timing("test_timing", value=21)
+                await wait_for(collected)
+
+        assert collected == [b"test_increment:1|c\ntest_gauge:42|g\ntest_timing:21|ms"]
+
+    async def test_split_by_max_packet_size(
+        self, unused_udp_port, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, buffered=True, max_packet_size=41
+            ) as statsd_client:
+                for i in range(5):
+                    statsd_client.increment(f"test_increment_{i}")
+                await wait_for(collected, count=3)
+
+        assert collected == [
+            b"test_increment_0:1|c\ntest_increment_1:1|c",
+            b"test_increment_2:1|c\ntest_increment_3:1|c",
+            b"test_increment_4:1|c",
+        ]
+
+    async def test_flush_on_close(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client = aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, buffered=True, flush_interval=60
+            )
+            await statsd_client.connect()
+            statsd_client.increment("test_increment")
+            statsd_client.increment("test_increment")
+            await asyncio.sleep(0.05)
+            assert collected == []
+
+            await statsd_client.close()
+            await wait_for(collected)
+
+        assert collected == [b"test_increment:1|c\ntest_increment:1|c"]
+
+
+@pytest.mark.skipif(
+    not hasattr(socket.socket, "sendmsg"), reason="sendmsg is not supported"
+)
+class TestClientScatterGather:
+    async def test_send(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                buffered=True,
+                scatter_gather=True,
+                max_packet_size=41,
+            ) as statsd_client:
+                assert statsd_client._protocol._sock is not None
+
+                for i in range(3):
+                    statsd_client.increment(f"test_increment_{i}")
+                await wait_for(collected, count=2)
+
+        assert collected == [
+            b"test_increment_0:1|c\ntest_increment_1:1|c",
+            b"test_increment_2:1|c",
+        ]
+        assert statsd_client.stats().bytes_sent == 61
+
+    async def test_send_uds(self, unused_socket_path, statsd_uds_server, wait_for):
+        uds_server, collected = statsd_uds_server
+
+        async with uds_server:
+            async with aiodogstatsd.Client(
+                socket_path=unused_socket_path, buffered=True, scatter_gather=True
+            ) as statsd_client:
+                statsd_client.increment("test_increment")
+                statsd_client.gauge("test_gauge", value=42)
+                await wait_for(collected)
+
+        assert collected == [b"test_increment:1|c\ntest_gauge:42|g"]
+
+    async def test_fallback_if_not_writable(
+        self, mocker, unused_udp_port, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, buffered=True, scatter_gather=True
+            ) as statsd_client:
+                sock = statsd_client._protocol._sock
+                statsd_client._protocol._sock = mocker.Mock(
+                    sendmsg=mocker.Mock(side_effect=BlockingIOError)
+                )
+
+                statsd_client.increment("test_increment")
+                statsd_client.gauge("test_gauge", value=42)
+                await wait_for(collected)
+
+                statsd_client._protocol._sock = sock
+
+        assert collected == [b"test_increment:1|c\ntest_gauge:42|g"]
+
+
+class TestClientDirectSend:
+    async def test_send(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, direct_send=True
+            ) as statsd_client:
+                statsd_client.increment("test_increment")
+                statsd_client.gauge("test_gauge", value=42)
+
+                # Metrics are sent by the caller without waking up the listener
+                assert not statsd_client._pending_queue
+                assert statsd_client.stats().packets_sent == 2
+
+                await wait_for(collected, count=2)
+
+        assert collected == [b"test_increment:1|c", b"test_gauge:42|g"]
+
+    async def test_fallback_if_not_writable(
+        self, mocker, unused_udp_port, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, direct_send=True
+            ) as statsd_client:
+                sock = statsd_client._protocol._sock
+                statsd_client._protocol._sock = mocker.Mock(
+                    send=mocker.Mock(side_effect=BlockingIOError)
+                )
+
+                statsd_client.increment("test_increment")
+                assert list(statsd_client._pending_queue) == [b"test_increment:1|c"]
+
+                # Enqueued metric is sent first to keep the order
+                statsd_client._protocol._sock = sock
+                statsd_client.gauge("test_gauge", value=42)
+                assert len(statsd_client._pending_queue) == 2
+
+                await wait_for(collected, count=2)
+
+        assert collected == [b"test_increment:1|c", b"test_gauge:42|g"]
+
+
+class TestClientUDS:
+    async def test_send(self, unused_socket_path, statsd_uds_server, wait_for):
+        uds_server, collected = statsd_uds_server
+
+        async with uds_server:
+            async with aiodogstatsd.Client(
+                socket_path=unused_socket_path, constant_tags={"whoami": "batman"}
+            ) as statsd_client:
+                statsd_client.gauge("test_gauge", value=42, tags={"and": "robin"})
+                await wait_for(collected)
+
+        assert collected == [b"test_gauge:42|g|#whoami:batman,and:robin"]
+
+    async def test_default_max_packet_size(self, unused_socket_path):
+        statsd_client = aiodogstatsd.Client(socket_path=unused_socket_path)
+        assert statsd_client._max_packet_size == 8192
+
+    async def test_reconnect(
+        self, mocker, unused_socket_path, statsd_uds_server, wait_for
+    ):
+        mocker.patch("aiodogstatsd.client._RECONNECT_INTERVAL", 0)
+        uds_server, collected = statsd_uds_server
+
+        async with uds_server:
+            statsd_client = aiodogstatsd.Client(
+                socket_path=unused_socket_path, read_timeout=0.01
+            )
+            await statsd_client.connect()
+            statsd_client.increment("test_increment_1")
+            await wait_for(collected)
+
+        # Server restarted and socket file recreated, metrics sent in between are lost
+        statsd_client.increment("test_increment_lost")
+        await asyncio.sleep(0.05)
+
+        async with uds_server:
+            attempts = 50
+            while attempts and len(collected) < 2:
+                statsd_client.increment("test_increment_2")
+                await asyncio.sleep(0.02)
+                attempts -= 1
+
+            await statsd_client.close()
+
+        assert collected[0] == b"test_increment_1:1|c"
+        assert set(collected[1:]) == {b"test_increment_2:1|c"}
+
+
+class TestClientAggregate:
+    async def test_aggregate(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                constant_tags={"whoami": "batman"},
+                aggregate=True,
+                aggregation_interval=0.05,
+            ) as statsd_client:
+                for _ in range(10):
+                    statsd_client.increment("test_increment", tags={"and": "robin"})
+                statsd_client.decrement("test_increment", value=3)
+                statsd_client.gauge("test_gauge", value=21)
+                statsd_client.gauge("test_gauge", value=42)
+                statsd_client.timing("test_timing", value=42)
+                await wait_for(collected, count=4)
+
+        assert sorted(collected) == [
+            b"test_gauge:42|g|#whoami:batman",
+            b"test_increment:-3|c|#whoami:batman",
+            b"test_increment:10|c|#whoami:batman,and:robin",
+            b"test_timing:42|ms|#whoami:batman",
+        ]
+
+    async def test_flush_on_close(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client = aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                aggregate=True,
+                aggregation_interval=60,
+            )
+            await statsd_client.connect()
+            statsd_client.increment("test_increment")
+            statsd_client.increment("test_increment")
+            await asyncio.sleep(0.05)
+            assert collected == []
+
+            await statsd_client.close()
+            await wait_for(collected)
+
+        assert collected == [b"test_increment:2|c"]
+
+    async def test_flush_if_max_contexts_reached(
+        self, unused_udp_port, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                aggregate=True,
+                aggregation_interval=60,
+                max_aggregation_contexts=1,
+            ) as statsd_client:
+                statsd_client.increment("test_increment_1")
+                statsd_client.increment("test_increment_2")
+                await wait_for(collected)
+
+                assert collected == [b"test_increment_1:1|c"]
+
+            await wait_for(collected, count=2)
+
+        assert collected == [b"test_increment_1:1|c", b"test_increment_2:1|c"]
+
+
+class TestClientExtendedAggregation:
+    async def test_aggregate(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                constant_tags={"whoami": "batman"},
+                extended_aggregation=True,
+                aggregation_interval=0.05,
+            ) as statsd_client:
+                for value in range(3):
+                    statsd_client.timing("test_timing", value=value)
+                statsd_client.histogram("test_histogram", value=42)
+                statsd_client.increment("test_increment")
+                await wait_for(collected, count=3)
+
+        assert sorted(collected) == [
+            b"test_histogram:42|h|#whoami:batman",
+            b"test_increment:1|c|#whoami:batman",
+            b"test_timing:0:1:2|ms|#whoami:batman",
+        ]
+
+    async def test_max_samples_per_context(
+        self, unused_udp_port, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client = aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                extended_aggregation=True,
+                aggregation_interval=60,
+                max_samples_per_context=5,
+            )
+            await statsd_client.connect()
+            for value in range(10):
+                statsd_client.distribution("test_distribution", value=value)
+            await statsd_client.close()
+            await wait_for(collected)
+
+        (metric,) = collected
+        assert metric.startswith(b"test_distribution:")
+        assert metric.endswith(b"|d|@0.5")
+        assert len(metric.split(b"|")[0].split(b":")) == 6
+
+
+class TestMetricHandle:
+    async def test_send(self, statsd_client, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+        handle = statsd_client.handle("test_handle", tags={"and": "robin"})
+
+        async with udp_server:
+            handle.gauge(42)
+            handle.increment()
+            handle.decrement(2)
+            handle.histogram(21)
+            handle.distribution(84)
+            handle.timing(42)
+            await wait_for(collected, count=6)
+
+        assert collected == [
+            b"test_handle:42|g|#whoami:batman,and:robin",
+            b"test_handle:1|c|#whoami:batman,and:robin",
+            b"test_handle:-2|c|#whoami:batman,and:robin",
+            b"test_handle:21|h|#whoami:batman,and:robin",
+            b"test_handle:84|d|#whoami:batman,and:robin",
+            b"test_handle:42|ms|#whoami:batman,and:robin",
+        ]
+
+    async def test_skip_if_sample_rate(self, mocker, statsd_client_samplerate):
+        pending_queue = statsd_client_samplerate._pending_queue
+        handle = statsd_client_samplerate.handle("test_handle")
+
+        mocker.patch("aiodogstatsd.client.random", return_value=0.2)
+        handle.increment()
+        assert list(pending_queue) == [b"test_handle:1|c|@0.3|#whoami:batman"]
+
+        pending_queue.clear()
+        mocker.patch("aiodogstatsd.client.random", return_value=0.4)
+        handle.increment()
+        assert list(pending_queue) == []
+
+    async def test_skip_if_closing(self):
+        statsd_client = aiodogstatsd.Client()
+        handle = statsd_client.handle("test_handle")
+        await statsd_client.connect()
+        await statsd_client.close()
+
+        handle.increment()
+        assert list(statsd_client._pending_queue) == []
+
+    async def test_aggregate(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                aggregate=True,
+                extended_aggregation=True,
+                aggregation_interval=0.05,
+            ) as statsd_client:
+                handle = statsd_client.handle("test_handle", tags={"and": "robin"})
+                handle.increment()
+                handle.increment(2)
+                handle.timing(1)
+                handle.timing(2)
+                await wait_for(collected, count=2)
+
+        assert sorted(collected) == [
+            b"test_handle:1:2|ms|#and:robin",
+            b"test_handle:3|c|#and:robin",
+        ]
+
+
+class TestClientCardinalityGuard:
+    async def test_collapse(self, unused_udp_port):
+        async with aiodogstatsd.Client(
+            host="0.0.0.0",
+            port=unused_udp_port,
+            max_contexts_per_metric=2,
+        ) as statsd_client:
+            pending_queue = statsd_client._pending_queue
+
+            for request_id in range(4):
+                statsd_client.increment("test_counter", tags={"request_id": request_id})
+            handle = statsd_client.handle("test_counter", tags={"request_id": 4})
+            handle.increment()
+            statsd_client.submit_many(
+                "test_timing",
+                [1],
+                type_=aiodogstatsd.MType.TIMING,
+                tags={"request_id": 5},
+            )
+
+            assert list(pending_queue) == [
+                b"test_counter:1|c|#request_id:0",
+                b"test_counter:1|c|#request_id:1",
+                b"test_counter:1|c|#request_id:_overflow",
+                b"test_counter:1|c|#request_id:_overflow",
+                b"test_counter:1|c|#request_id:_overflow",
+                b"test_timing:1|ms|#request_id:5",
+            ]
+            pending_queue.clear()
+
+        assert statsd_client.stats().metrics_tags_collapsed == 3
+        # Collapsed headers don't evict known ones
+        assert statsd_client.header_cache_info().currsize == 3
+
+    async def test_aggregate(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                aggregate=True,
+                max_contexts_per_metric=1,
+            ) as statsd_client:
+                for request_id in range(4):
+                    statsd_client.increment(
+                        "test_counter", tags={"request_id": request_id}
+                    )
+            await wait_for(collected, count=2)
+
+        assert sorted(collected) == [
+            b"test_counter:1|c|#request_id:0",
+            b"test_counter:3|c|#request_id:_overflow",
+        ]
+
+
+class TestClientAdaptiveSampling:
+    async def test_adapt_sample_rate(self, mocker, unused_udp_port):
+        mocker.patch("aiodogstatsd.client.random", return_value=0)
+
+        async with aiodogstatsd.Client(
+            host="0.0.0.0",
+            port=unused_udp_port,
+            pending_queue_size=100,
+            adaptive_sampling=True,
+        ) as statsd_client:
+            pending_queue = statsd_client._pending_queue
+            handle = statsd_client.handle("test_handle", sample_rate=0.5)
+
+            # Listener doesn't run until we yield, so the pending queue gets full
+            for _ in range(100):
+                statsd_client.increment("test_counter")
+            await asyncio.sleep(0)
+            assert not pending_queue
+
+            statsd_client.increment("test_counter")
+            statsd_client.gauge("test_gauge", value=42)
+            statsd_client.timing("test_timing", value=1, sample_rate=0.5)
+            handle.timing(1)
+            assert list(pending_queue) == [
+                b"test_counter:1|c|@0.25",
+                b"test_gauge:42|g",
+                b"test_timing:1|ms|@0.125",
+                b"test_handle:1|ms|@0.125",
+            ]
+
+    async def test_disabled(self, mocker, unused_udp_port):
+        async with aiodogstatsd.Client(
+            host="0.0.0.0", port=unused_udp_port, pending_queue_size=100
+        ) as statsd_client:
+            for _ in range(100):
+                statsd_client.increment("test_counter")
+            await asyncio.sleep(0)
+
+            statsd_client.increment("test_counter")
+            assert list(statsd_client._pending_queue) == [b"test_counter:1|c"]
+
+
+class TestClientLoopMonitor:
+    async def test_monitor(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                loop_monitor_interval=0.01,
+                slow_callback_threshold=0.05,
+            ) as statsd_client:
+                # Block the event loop when the probe should be called
+                await asyncio.sleep(0.005)
+                time.sleep(0.1)
+                await wait_for(collected, count=3)
+
+            assert statsd_client._loop_monitor._handle is None
+
+        lag = float(collected[0].split(b":")[1].split(b"|")[0])
+        assert lag > 50
+        assert collected[0].endswith(b"|d")
+        assert collected[1] == b"event_loop.delayed_probes:1|c"
+        assert collected[2].startswith(b"event_loop.tasks:")
+
+
+class TestClientCollectors:
+    async def test_collect(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        class FailingCollector(Collector):
+            def collect(self):
+                raise RuntimeError
+
+        class ValuesCollector(Collector):
+            __slots__ = ("started", "stopped")
+
+            def __init__(self):
+                self.started = self.stopped = False
+
+            def start(self):
+                self.started = True
+
+            def stop(self):
+                self.stopped = True
+
+            def collect(self):
+                return [
+                    Metric("test_gauge", aiodogstatsd.MType.GAUGE, (1, 2)),
+                    Metric(
+                        "test_distribution",
+                        aiodogstatsd.MType.DISTRIBUTION,
+                        [1, 2],
+                        {"and": "robin"},
+                    ),
+                ]
+
+        collector = ValuesCollector()
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                collectors=[FailingCollector(), collector],
+                collect_interval=0.01,
+            ):
+                assert collector.started
+                await wait_for(collected, count=2)
+
+        assert collector.stopped
+        assert collected[:2] == [
+            b"test_gauge:2|g",
+            b"test_distribution:1:2|d|#and:robin",
+        ]
+
+
+class TestClientReplay:
+    @pytest.fixture
+    def failing_send(self, mocker):
+        mocker.patch("aiodogstatsd.client._RECONNECT_INTERVAL", 0)
+
+        failing = {"enabled": True}
+        send = DatagramProtocol.send
+
+        mocker.patch.object(
+            DatagramProtocol,
+            "send",
+            autospec=True,
+            side_effect=lambda protocol, data: (
+                False if failing["enabled"] else send(protocol, data)
+            ),
+        )
+
+        return failing
+
+    async def test_replay(self, unused_udp_port, statsd_server, wait_for, failing_send):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, replay_buffer_size=1024
+            ) as statsd_client:
+                statsd_client.increment("test_first")
+                statsd_client.increment("test_second")
+                while len(statsd_client._replay_buffer) < 2:
+                    await asyncio.sleep(0.01)
+
+                failing_send["enabled"] = False
+                await wait_for(collected, count=2)
+
+        assert collected == [b"test_first:1|c", b"test_second:1|c"]
+
+        stats = statsd_client.stats()
+        assert stats.packets_sent == 2
+        assert stats.packets_dropped == 0
+
+    async def test_replay_from_file(
+        self, unused_udp_port, statsd_server, wait_for, failing_send, tmp_path
+    ):
+        udp_server, collected = statsd_server
+        path = str(tmp_path / "replay")
+
+        async with aiodogstatsd.Client(
+            host="0.0.0.0",
+            port=unused_udp_port,
+            replay_buffer_size=1024,
+            replay_buffer_path=path,
+        ) as statsd_client:
+            statsd_client.increment("test_increment")
+
+        failing_send["enabled"] = False
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                replay_buffer_size=1024,
+                replay_buffer_path=path,
+            ):
+                await wait_for(collected)
+
+        assert collected == [b"test_increment:1|c"]
+
+    async def test_replay_after_error_received(
+        self, unused_udp_port, statsd_server, wait_for, mocker
+    ):
+        mocker.patch("aiodogstatsd.client._RECONNECT_INTERVAL", 0)
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, replay_buffer_size=1024
+            ) as statsd_client:
+                # Refused datagram is reported asynchronously, after it was sent
+                statsd_client._protocol.error_received(ConnectionRefusedError())
+                statsd_client._send_packet(b"test_first:1|c", 1)
+                statsd_client._send_packet(b"test_second:1|c", 1)
+                assert len(statsd_client._replay_buffer) == 2
+
+                await wait_for(collected, count=2)
+
+        assert collected == [b"test_first:1|c", b"test_second:1|c"]
+
+    async def test_send_after_recovery(
+        self, unused_udp_port, statsd_server, wait_for, failing_send
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                replay_buffer_size=2 ** 16,
+                replay_rate=100,
+            ) as statsd_client:
+                statsd_client.increment("test_kept")
+                while not len(statsd_client._replay_buffer):
+                    await asyncio.sleep(0.01)
+
+                failing_send["enabled"] = False
+                while statsd_client._server_unavailable():
+                    await asyncio.sleep(0.01)
+
+                # New metrics aren't held back by replay pacing
+                for _ in range(10):
+                    for _ in range(50):
+                        statsd_client.increment("test_increment")
+                    await asyncio.sleep(0.01)
+
+                await wait_for(collected, count=501)
+                assert len(statsd_client._replay_buffer) == 0
+
+        assert sorted(collected) == [b"test_increment:1|c"] * 500 + [b"test_kept:1|c"]
+
+    async def test_direct_send_while_unavailable(
+        self, unused_udp_port, statsd_server, wait_for, mocker
+    ):
+        mocker.patch("aiodogstatsd.client._RECONNECT_INTERVAL", 0)
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                replay_buffer_size=1024,
+                direct_send=True,
+            ) as statsd_client:
+                statsd_client._protocol.error_received(ConnectionRefusedError())
+                statsd_client.increment("test_first")
+                statsd_client.increment("test_second")
+                assert list(statsd_client._pending_queue) == [
+                    b"test_first:1|c",
+                    b"test_second:1|c",
+                ]
+
+                await wait_for(collected, count=2)
+
+        assert collected == [b"test_first:1|c", b"test_second:1|c"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not supported")
+class TestClientFork:
+    async def test_send_after_fork(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client = aiodogstatsd.Client(host="0.0.0.0", port=unused_udp_port)
+            await statsd_client.connect()
+            statsd_client.increment("test_increment_parent")
+
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                exitcode = 1
+                try:
+
+                    async def main():
+                        assert not statsd_client.connected
+                        statsd_client.increment("test_increment_child")
+                        assert statsd_client.connected
+                        await statsd_client.close()
+
+                    asyncio.run(main())
+                    exitcode = 0
+                finally:
+                    sys.stderr.flush()
+                    os._exit(exitcode)
+
+            _, status = os.waitpid(pid, 0)
+            assert os.WEXITSTATUS(status) == 0
+
+            await wait_for(collected, count=2)
+            await statsd_client.close()
+
+        # Metric enqueued in the parent process is sent once
+        assert sorted(collected) == [
+            b"test_increment_child:1|c",
+            b"test_increment_parent:1|c",
+        ]
+
+    async def test_close_after_fork(self, unused_udp_port):
+        statsd_client = aiodogstatsd.Client(host="0.0.0.0", port=unused_udp_port)
+        await statsd_client.connect()
+
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            exitcode = 1
+            try:
+                asyncio.run(statsd_client.close())
+                exitcode = 0 if statsd_client.disconnected else 1
+            finally:
+                os._exit(exitcode)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.WEXITSTATUS(status) == 0
+        assert statsd_client.connected
+
+        await statsd_client.close()
+
+    async def test_replay_after_fork(
+        self, unused_udp_port, statsd_server, wait_for, tmp_path, mocker
+    ):
+        # Kept packets aren't replayed before closing
+        mocker.patch("aiodogstatsd.client._REPLAY_INTERVAL", 60)
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client = aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                replay_buffer_size=1024,
+                replay_buffer_path=str(tmp_path / "replay"),
+            )
+            await statsd_client.connect()
+
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover
+                exitcode = 1
+                try:
+
+                    async def main():
+                        statsd_client.increment("test_increment_child")
+                        while not statsd_client._protocol.connected:
+                            await asyncio.sleep(0.01)
+
+                        statsd_client._protocol.error_received(ConnectionRefusedError())
+                        statsd_client._send_packet(b"test_kept_child:1|c", 1)
+                        assert len(statsd_client._replay_buffer) >= 1
+                        await statsd_client.close()
+
+                    asyncio.run(main())
+                    exitcode = 0
+                finally:
+                    sys.stderr.flush()
+                    os._exit(exitcode)
+
+            _, status = os.waitpid(pid, 0)
+            assert os.WEXITSTATUS(status) == 0
+
+            await wait_for(collected, count=2)
+            # Parent's file backed buffer isn't touched by the child process
+            assert len(statsd_client._replay_buffer) == 0
+            await statsd_client.close()
+
+        # Packets kept in memory by the child process are sent on closing
+        assert sorted(collected) == [
+            b"test_increment_child:1|c",
+            b"test_kept_child:1|c",
+        ]
+
+    async def test_stats_after_fork(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port
+            ) as statsd_client:
+                statsd_client.increment("test_increment_parent")
+                await wait_for(collected)
+
+                pid = os.fork()
+                if pid == 0:  # pragma: no cover
+                    exitcode = 1
+                    try:
+                        exitcode = 0 if not any(statsd_client.stats()) else 1
+                    finally:
+                        os._exit(exitcode)
+
+                _, status = os.waitpid(pid, 0)
+                assert os.WEXITSTATUS(status) == 0
+                assert statsd_client.stats().packets_sent == 1
+
+
+class TestClientTelemetry:
+    async def test_stats(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            statsd_client = aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, pending_queue_size=2
+            )
+            await statsd_client.connect()
+            for _ in range(3):
+                statsd_client.increment("test_increment")
+            await wait_for(collected, count=2)
+            await statsd_client.close()
+            statsd_client.increment("test_increment")
+
+        stats = statsd_client.stats()
+        assert stats.metrics_enqueued == 2
+        assert stats.metrics_dropped_queue_full == 1
+        assert stats.metrics_dropped_send_error == 0
+        assert stats.metrics_dropped_closing == 1
+        assert stats.packets_sent == 2
+        assert stats.packets_dropped == 0
+        assert stats.bytes_sent == 36
+        assert stats.pending_queue_high_water_mark == 2
+        assert stats.send_latency_max > 0
+
+    async def test_stats_buffered(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0", port=unused_udp_port, buffered=True
+            ) as statsd_client:
+                for _ in range(3):
+                    statsd_client.increment("test_increment")
+                await wait_for(collected)
+
+        stats = statsd_client.stats()
+        assert stats.metrics_enqueued == 3
+        assert stats.packets_sent == 1
+        assert stats.bytes_sent == 56
+
+    async def test_stats_send_error(self, mocker, unused_udp_port):
+        mocker.patch(
+            "asyncio.selector_events._SelectorDatagramTransport.sendto",
+            autospec=True,
+            side_effect=lambda transport, data, addr=None: (
+                transport._protocol.error_received(ConnectionRefusedError())
+            ),
+        )
+
+        async with aiodogstatsd.Client(
+            host="0.0.0.0", port=unused_udp_port
+        ) as statsd_client:
+            statsd_client.increment("test_increment")
+
+        stats = statsd_client.stats()
+        assert stats.metrics_enqueued == 1
+        assert stats.metrics_dropped_send_error == 1
+        assert stats.packets_sent == 0
+        assert stats.packets_dropped == 1
+
+    async def test_send_telemetry(self, unused_udp_port, statsd_server, wait_for):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiodogstatsd.Client(
+                host="0.0.0.0",
+                port=unused_udp_port,
+                namespace="namespace",
+                constant_tags={"whoami": "batman"},
+                telemetry_interval=60,
+            ) as statsd_client:
+                statsd_client.increment("test_increment")
+                await wait_for(collected)
+
+            await wait_for(collected, count=12)
+
+        assert collected[0] == b"namespace.test_increment:1|c|#whoami:batman"
+        assert collected[1] == (
+            b"aiodogstatsd.client.metrics_enqueued:1|c|#whoami:batman"
+        )
+        assert collected[2] == (
+            b"aiodogstatsd.client.metrics_dropped:0|c|#whoami:batman,reason:queue_full"
+        )
+        assert collected[7] == b"aiodogstatsd.client.packets_sent:1|c|#whoami:batman"
@@ -0,0 +1,120 @@
+import gc
+import sys
+
+import pytest
+
+from aiodogstatsd import typedefs
+from aiodogstatsd.collectors import (
+    Collector,
+    InFlightCollector,
+    Metric,
+    RuntimeCollector,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_runtime_collector():
+    collector = RuntimeCollector(prefix="prefix")
+    collector.start()
+    try:
+        gc.collect()
+        metrics = {
+            (metric.name, metric.type_): metric for metric in collector.collect()
+        }
+    finally:
+        collector.stop()
+
+    gc_pause = metrics[("prefix.gc.pause", typedefs.MType.DISTRIBUTION)]
+    assert gc_pause.tags == {"generation": 2}
+    assert len(gc_pause.values) >= 1
+
+    gc_collections = metrics[("prefix.gc.collections", typedefs.MType.COUNTER)]
+    assert gc_collections.tags == {"generation": 2}
+    assert gc_collections.values[0] >= 1
+
+    assert metrics[("prefix.threads", typedefs.MType.GAUGE)].values[0] >= 1
+    assert metrics[("prefix.tasks", typedefs.MType.GAUGE)].values[0] >= 1
+    if sys.platform.startswith("linux"):
+        assert metrics[("prefix.memory.rss", typedefs.MType.GAUGE)].values[0] > 0
+        assert metrics[("prefix.fds", typedefs.MType.GAUGE)].values[0] > 0
+
+    # GC callback is removed after stop
+    gc.collect()
+    assert not any(metric.name == "prefix.gc.pause" for metric in collector.collect())
+
+
+async def test_runtime_collector_reset():
+    collector = RuntimeCollector(prefix="prefix")
+    collector._on_gc("start", {"generation": 0})
+    collector._on_gc("stop", {"generation": 0})
+
+    collector.reset()
+
+    assert not any(metric.name == "prefix.gc.pause" for metric in collector.collect())
+
+
+async def test_in_flight_collector():
+    collector = InFlightCollector(name="in_flight", sample_interval=60)
+    collector.start()
+    try:
+        first = collector.enter("/hello")
+        collector.enter(lambda: "/hello/{name}")
+        collector.enter(lambda: None)
+        collector._sample()
+
+        collector.leave(first)
+        collector._sample()
+
+        metrics = sorted(
+            collector.collect(), key=lambda metric: (metric.name, metric.tags["path"])
+        )
+        assert metrics == [
+            Metric("in_flight.max", typedefs.MType.GAUGE, (1,), {"path": "/hello"}),
+            Metric(
+                "in_flight.max", typedefs.MType.GAUGE, (1,), {"path": "/hello/{name}"}
+            ),
+            Metric("in_flight.mean", typedefs.MType.GAUGE, (0.5,), {"path": "/hello"}),
+            Metric(
+                "in_flight.mean",
+                typedefs.MType.GAUGE,
+                (1.0,),
+                {"path": "/hello/{name}"},
+            ),
+        ]
+
+        # Idle template is sent with zeros once
+        collector._sample()
+        assert [
+            metric
+            for metric in collector.collect()
+            if metric.tags == {"path": "/hello"}
+        ] == [
+            Metric("in_flight.max", typedefs.MType.GAUGE, (0,), {"path": "/hello"}),
+            Metric("in_flight.mean", typedefs.MType.GAUGE, (0.0,), {"path": "/hello"}),
+        ]
+        assert all(metric.tags != {"path": "/hello"} for metric in collector.collect())
+    finally:
+        collector.stop()
+
+
+async def test_in_flight_collector_reset():
+    collector = InFlightCollector(name="in_flight", sample_interval=60)
+    collector.enter("/hello")
+    collector._sample()
+
+    # Request in flight in the parent process is forgotten in the child process
+    collector.reset()
+    collector._sample()
+    try:
+        assert collector.collect() == []
+    finally:
+        collector.stop()
+
+
+async def test_collector_without_collect():
+    class IncompleteCollector(Collector):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteCollector()  # type: ignore
@@ -7,6 +7,8 @@ import pytest
 from aiohttp import web
 from yarl import URL
 
+from aiodogstatsd import typedefs
+from aiodogstatsd.collectors import InFlightCollector, Metric
 from aiodogstatsd.contrib import aiohttp as aiodogstatsd
 
 pytestmark = pytest.mark.asyncio
@@ -27,14 +29,26 @@ def current_task():
         return asyncio.Task.current_task()
 
 
+@pytest.fixture
+def middleware_kwargs():
+    return {}
+
+
 @pytest.fixture(autouse=True)
-async def aiohttp_server(unused_tcp_port, unused_udp_port):
+async def aiohttp_server(unused_tcp_port, unused_udp_port, middleware_kwargs):
     async def handler_hello(request):
         return web.json_response({"hello": "aiodogstatsd"})
 
     async def handler_hello_variable(request):
         return web.json_response({"hello": request.match_info["name"]})
 
+    async def handler_stream(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(b"hello")
+        await response.write_eof()
+        return response
+
     async def handler_bad_request(request):
         return web.json_response({"hello": "bad"}, status=HTTPStatus.BAD_REQUEST)
 
@@ -44,7 +58,10 @@ async def aiohttp_server(unused_tcp_port, unused_udp_port):
     async def handler_unauthorized(request):
         raise web.HTTPUnauthorized()
 
-    app = web.Application(middlewares=[aiodogstatsd.middleware_factory()])
+    app = web.Application(
+        middlewares=[aiodogstatsd.middleware_factory(**middleware_kwargs)]
+    )
+    app.on_response_prepare.append(aiodogstatsd.on_response_prepare)
     app.cleanup_ctx.append(
         aiodogstatsd.cleanup_context_factory(
             host="0.0.0.0", port=unused_udp_port, constant_tags={"whoami": "batman"}
@@ -55,6 +72,7 @@ async def aiohttp_server(unused_tcp_port, unused_udp_port):
         [
             web.get("/hello", handler_hello),
             web.get("/hello/{name}", handler_hello_variable),
+            web.get("/stream", handler_stream),
             web.post("/bad_request", handler_bad_request),
             web.get("/internal_server_error", handler_internal_server_error),
             web.get("/unauthorized", handler_unauthorized),
@@ -82,6 +100,8 @@ def mock_loop_time(mocker):
 
     mocker.patch("aiodogstatsd.contrib.aiohttp.get_event_loop", return_value=mock_loop)
 
+    return mock_loop
+
 
 class TestAIOHTTP:
     async def test_ok(self, aiohttp_server_url, statsd_server, wait_for):
@@ -187,6 +207,140 @@ class TestAIOHTTP:
 
         assert collected == []
 
+    @pytest.mark.parametrize("handles_cache_size", (1024, 1))
+    async def test_cached_handles(
+        self,
+        aiohttp_server_url,
+        statsd_server,
+        wait_for,
+        mock_loop_time,
+        mocker,
+        handles_cache_size,
+    ):
+        mocker.patch(
+            "aiodogstatsd.contrib.aiohttp._HANDLES_CACHE_SIZE", handles_cache_size
+        )
+        mock_loop_time.time.side_effect = [0, 1, 0, 2, 0, 3]
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiohttp.ClientSession() as session:
+                for path in ("hello", "unauthorized", "hello"):
+                    async with session.get(aiohttp_server_url / path):
+                        pass
+
+            await wait_for(collected, count=3)
+
+        assert collected == [
+            b"http_request_duration:1000|ms"
+            b"|#whoami:batman,method:GET,path:/hello,status:200",
+            b"http_request_duration:2000|ms"
+            b"|#whoami:batman,method:GET,path:/unauthorized,status:401",
+            b"http_request_duration:3000|ms"
+            b"|#whoami:batman,method:GET,path:/hello,status:200",
+        ]
+
+    @pytest.mark.parametrize(
+        "middleware_kwargs",
+        (
+            {
+                "time_to_first_byte_metric_name": "http_time_to_first_byte",
+                "response_duration_metric_name": "http_response_duration",
+                "response_size_metric_name": "http_response_size",
+            },
+        ),
+    )
+    @pytest.mark.parametrize(
+        "path, expected_order, expected_size",
+        (
+            # Response is sent after the handler returned it
+            ("hello", ["request", "first_byte", "response", "size"], 25),
+            # Response is sent by the handler itself with chunked encoding
+            ("stream", ["first_byte", "response", "size", "request"], 5),
+        ),
+    )
+    async def test_response_metrics(
+        self,
+        aiohttp_server_url,
+        statsd_server,
+        wait_for,
+        mock_loop_time,
+        path,
+        expected_order,
+        expected_size,
+    ):
+        mock_loop_time.time.side_effect = [0, 1, 2, 3]
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(aiohttp_server_url / path) as resp:
+                    assert resp.status == HTTPStatus.OK
+                    await resp.read()
+
+            await wait_for(collected, count=4)
+
+        tags = f"|#whoami:batman,method:GET,path:/{path},status:200".encode()
+        expected = {
+            "request": b"http_request_duration:%d|ms" + tags,
+            "first_byte": b"http_time_to_first_byte:%d|ms" + tags,
+            "response": b"http_response_duration:%d|ms" + tags,
+        }
+        ms = 1000
+        for idx, metric in enumerate(expected_order):
+            if metric == "size":
+                assert collected[idx] == (
+                    b"http_response_size:%d|d" % expected_size + tags
+                )
+            else:
+                assert collected[idx] == expected[metric] % ms
+                ms += 1000
+
+    @pytest.mark.parametrize(
+        "middleware_kwargs", ({"in_flight_collector": InFlightCollector()},)
+    )
+    async def test_in_flight(
+        self, aiohttp_server_url, middleware_kwargs, mocker, mock_loop_time
+    ):
+        mock_loop_time.time.side_effect = None
+        mock_loop_time.time.return_value = 0
+        collector = middleware_kwargs["in_flight_collector"]
+
+        # Requests in flight are counted right before the request leaves, requests not
+        # matched by any route aren't added at all
+        leave = InFlightCollector.leave
+
+        def sample_and_leave(self, token):
+            self._sample()
+            leave(self, token)
+
+        mocker.patch.object(
+            InFlightCollector, "leave", autospec=True, side_effect=sample_and_leave
+        )
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                for path in ("hello/batman", "not_found"):
+                    async with session.get(aiohttp_server_url / path):
+                        pass
+
+            assert collector.collect() == [
+                Metric(
+                    "http_requests_in_flight.max",
+                    typedefs.MType.GAUGE,
+                    (1,),
+                    {"path": "/hello/{name}"},
+                ),
+                Metric(
+                    "http_requests_in_flight.mean",
+                    typedefs.MType.GAUGE,
+                    (1.0,),
+                    {"path": "/hello/{name}"},
+                ),
+            ]
+        finally:
+            collector.stop()
+
     @pytest.mark.timeout(10)
     async def test_client_closed_correctly(self):
         # Simulate actual behavior of the web.run_app clean up phase:
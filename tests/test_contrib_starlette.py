@@ -5,23 +5,40 @@ from async_asgi_testclient import TestClient
 from starlette.applications import Starlette
 from starlette.exceptions import HTTPException
 from starlette.middleware import Middleware
-from starlette.responses import JSONResponse
-from starlette.routing import Route
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Host, Mount, Route
 
 import aiodogstatsd
+from aiodogstatsd import typedefs
+from aiodogstatsd.collectors import InFlightCollector, Metric
 from aiodogstatsd.contrib.starlette import StatsDMiddleware
 
 pytestmark = pytest.mark.asyncio
 
 
 @pytest.fixture
-def starlette_application(unused_udp_port):
+def middleware_kwargs():
+    return {}
+
+
+@pytest.fixture
+def starlette_application(unused_udp_port, middleware_kwargs):
     async def handler_hello(request):
         return JSONResponse({"hello": "aiodogstatsd"})
 
     async def handler_hello_variable(request):
         return JSONResponse({"hello": request.path_params["name"]})
 
+    async def handler_mounted(request):
+        return JSONResponse({"hello": request.path_params["name"]})
+
+    async def handler_stream(request):
+        async def stream():
+            for chunk in (b"hello", b"aiodogstatsd"):
+                yield chunk
+
+        return StreamingResponse(stream())
+
     async def handler_bad_request(request):
         return JSONResponse({"hello": "bad"}, status_code=HTTPStatus.BAD_REQUEST)
 
@@ -39,12 +56,19 @@ def starlette_application(unused_udp_port):
         debug=True,
         routes=[
             Route("/hello", handler_hello),
+            Route("/hi", handler_hello),
+            Route("/stream", handler_stream),
             Route("/hello/{name}", handler_hello_variable),
             Route("/bad_request", handler_bad_request, methods=["POST"]),
             Route("/internal_server_error", handler_internal_server_error),
             Route("/unauthorized", handler_unauthorized),
+            Mount(
+                "/api",
+                routes=[Mount("/v1", routes=[Route("/hello/{name}", handler_mounted)])],
+            ),
+            Host("example.org", app=PlainTextResponse("hello")),
         ],
-        middleware=[Middleware(StatsDMiddleware, client=client)],
+        middleware=[Middleware(StatsDMiddleware, client=client, **middleware_kwargs)],
         on_startup=[client.connect],
         on_shutdown=[client.close],
     )
@@ -59,6 +83,8 @@ def mock_loop_time(mocker):
         "aiodogstatsd.contrib.starlette.get_event_loop", return_value=mock_loop
     )
 
+    return mock_loop
+
 
 class TestStarlette:
     async def test_ok(self, starlette_application, statsd_server, wait_for):
@@ -93,6 +119,106 @@ class TestStarlette:
             b"|#whoami:batman,method:GET,path:/hello/{name},status:200"
         ]
 
+    async def test_ok_shared_endpoint(
+        self, starlette_application, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with TestClient(starlette_application) as client:
+                resp = await client.get("/hi")
+                assert resp.status_code == HTTPStatus.OK
+
+            await wait_for(collected)
+
+        assert collected == [
+            b"http_request_duration:1000|ms"
+            b"|#whoami:batman,method:GET,path:/hi,status:200"
+        ]
+
+    async def test_ok_mounted_route(
+        self, starlette_application, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with TestClient(starlette_application) as client:
+                resp = await client.get("/api/v1/hello/batman")
+                assert resp.status_code == HTTPStatus.OK
+
+            await wait_for(collected)
+
+        assert collected == [
+            b"http_request_duration:1000|ms"
+            b"|#whoami:batman,method:GET,path:/api/v1/hello/{name},status:200"
+        ]
+
+    async def test_ok_host_without_routes(
+        self, starlette_application, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with TestClient(starlette_application) as client:
+                resp = await client.get("/plain", headers={"host": "example.org"})
+                assert resp.status_code == HTTPStatus.OK
+
+            await wait_for(collected)
+
+        assert collected == [
+            b"http_request_duration:1000|ms"
+            b"|#whoami:batman,method:GET,path:/plain,status:200"
+        ]
+
+    async def test_ok_streaming_response(
+        self, starlette_application, statsd_server, wait_for
+    ):
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with TestClient(starlette_application) as client:
+                resp = await client.get("/stream")
+                assert resp.status_code == HTTPStatus.OK
+                assert resp.content == b"helloaiodogstatsd"
+
+            await wait_for(collected)
+
+        assert collected == [
+            b"http_request_duration:1000|ms"
+            b"|#whoami:batman,method:GET,path:/stream,status:200"
+        ]
+
+    @pytest.mark.parametrize(
+        "middleware_kwargs",
+        (
+            {
+                "time_to_first_byte_metric_name": "http_time_to_first_byte",
+                "response_size_metric_name": "http_response_size",
+            },
+        ),
+    )
+    async def test_response_metrics(
+        self, starlette_application, statsd_server, wait_for, mock_loop_time
+    ):
+        mock_loop_time.time.side_effect = [0, 1, 2]
+        udp_server, collected = statsd_server
+
+        async with udp_server:
+            async with TestClient(starlette_application) as client:
+                resp = await client.get("/stream")
+                assert resp.status_code == HTTPStatus.OK
+
+            await wait_for(collected, count=3)
+
+        assert collected == [
+            b"http_time_to_first_byte:1000|ms"
+            b"|#whoami:batman,method:GET,path:/stream,status:200",
+            b"http_request_duration:2000|ms"
+            b"|#whoami:batman,method:GET,path:/stream,status:200",
+            b"http_response_size:17|d"
+            b"|#whoami:batman,method:GET,path:/stream,status:200",
+        ]
+
     async def test_bad_request(self, starlette_application, statsd_server, wait_for):
         udp_server, collected = statsd_server
 
@@ -154,14 +280,61 @@ class TestStarlette:
 
         assert collected == []
 
-    async def test_not_found(self, starlette_application, statsd_server, wait_for):
+    @pytest.mark.parametrize("path", ("/not_found", "/api/v1/not_found"))
+    async def test_not_found(
+        self, starlette_application, statsd_server, wait_for, path
+    ):
         udp_server, collected = statsd_server
 
         async with udp_server:
             async with TestClient(starlette_application) as client:
-                resp = await client.get("/not_found")
+                resp = await client.get(path)
                 assert resp.status_code == HTTPStatus.NOT_FOUND
 
             await wait_for(collected)
 
         assert collected == []
+
+    @pytest.mark.parametrize(
+        "middleware_kwargs", ({"in_flight_collector": InFlightCollector()},)
+    )
+    async def test_in_flight(
+        self, starlette_application, middleware_kwargs, mocker, mock_loop_time
+    ):
+        mock_loop_time.time.side_effect = None
+        mock_loop_time.time.return_value = 0
+        collector = middleware_kwargs["in_flight_collector"]
+
+        # Requests in flight are counted right before the request leaves, requests not
+        # matched by any route are added, but they aren't counted
+        leave = InFlightCollector.leave
+
+        def sample_and_leave(self, token):
+            self._sample()
+            leave(self, token)
+
+        mocker.patch.object(
+            InFlightCollector, "leave", autospec=True, side_effect=sample_and_leave
+        )
+
+        try:
+            async with TestClient(starlette_application) as client:
+                for path in ("/hello/batman", "/not_found"):
+                    await client.get(path)
+
+            assert collector.collect() == [
+                Metric(
+                    "http_requests_in_flight.max",
+                    typedefs.MType.GAUGE,
+                    (1,),
+                    {"path": "/hello/{name}"},
+                ),
+                Metric(
+                    "http_requests_in_flight.mean",
+                    typedefs.MType.GAUGE,
+                    (0.5,),
+                    {"path": "/hello/{name}"},
+                ),
+            ]
+        finally:
+            collector.stop()
@@ -32,3 +32,161 @@ from aiodogstatsd import protocol, typedefs
 )
 def test_build(in_, out):
     assert out == protocol.build(**in_)
+
+
+@pytest.mark.parametrize(
+    "in_, out",
+    (
+        (
+            {
+                "name": "name_1",
+                "namespace": None,
+                "values": [],
+                "type_": typedefs.MType.HISTOGRAM,
+                "tags": "",
+                "sample_rate": 1,
+                "max_size": 1432,
+            },
+            [],
+        ),
+        (
+            {
+                "name": "name_2",
+                "namespace": "namespace_2",
+                "values": [1, 2, 3],
+                "type_": typedefs.MType.HISTOGRAM,
+                "tags": "tag_key_1:tag_value_1",
+                "sample_rate": 0.5,
+                "max_size": 1432,
+            },
+            [b"namespace_2.name_2:1:2:3|h|@0.5|#tag_key_1:tag_value_1"],
+        ),
+        (
+            {
+                "name": "name_3",
+                "namespace": None,
+                "values": [1, 22, 3, 4444444444],
+                "type_": typedefs.MType.TIMING,
+                "tags": "",
+                "sample_rate": 1,
+                "max_size": 16,
+            },
+            [b"name_3:1:22:3|ms", b"name_3:4444444444|ms"],
+        ),
+        (
+            {
+                "name": "name_4",
+                "namespace": None,
+                "values": [1, 4444444444, 2.5],
+                "type_": typedefs.MType.TIMING,
+                "tags": "",
+                "sample_rate": 1,
+                "max_size": 16,
+            },
+            [b"name_4:1|ms", b"name_4:4444444444|ms", b"name_4:2.5|ms"],
+        ),
+    ),
+)
+def test_build_packed(in_, out):
+    assert out == protocol.build_packed(**in_)
+
+
+@pytest.mark.parametrize(
+    "constant_tags, tags",
+    (
+        ({}, None),
+        ({}, {"tag_key_1": "tag_value_1"}),
+        ({"tag_key_1": "tag_value_1"}, None),
+        ({"tag_key_1": "tag_value_1"}, {"tag_key_2": "tag_value_2"}),
+        (
+            {"tag_key_1": "tag_value_1", "tag_key_2": "tag_value_2"},
+            {"tag_key_1": "tag_value_3", "tag_key_4": "tag_value_4"},
+        ),
+    ),
+)
+@pytest.mark.parametrize("namespace", (None, "namespace"))
+@pytest.mark.parametrize("sample_rate", (1, 0.5))
+def test_builder_build(constant_tags, tags, namespace, sample_rate):
+    builder = protocol.Builder(
+        namespace=namespace, constant_tags=constant_tags, cache_size=8
+    )
+
+    for _ in range(2):
+        assert builder.build(
+            name="name",
+            value=42,
+            type_=typedefs.MType.GAUGE,
+            tags=tags,
+            sample_rate=sample_rate,
+        ) == protocol.build(
+            name="name",
+            namespace=namespace,
+            value=42,
+            type_=typedefs.MType.GAUGE,
+            tags=dict(constant_tags, **tags or {}),
+            sample_rate=sample_rate,
+        )
+
+    assert builder.cache_info() == protocol.CacheInfo(
+        hits=1, misses=1, maxsize=8, currsize=1
+    )
+
+
+def test_builder_build_packed():
+    builder = protocol.Builder(
+        namespace="namespace", constant_tags={"tag_key_1": "tag_value_1"}, cache_size=8
+    )
+
+    assert builder.build_packed(
+        name="name",
+        values=range(5),
+        type_=typedefs.MType.HISTOGRAM,
+        tags={"tag_key_2": "tag_value_2"},
+        sample_rate=0.5,
+        max_size=70,
+    ) == [
+        b"namespace.name:0:1|h|@0.5|#tag_key_1:tag_value_1,tag_key_2:tag_value_2",
+        b"namespace.name:2:3|h|@0.5|#tag_key_1:tag_value_1,tag_key_2:tag_value_2",
+        b"namespace.name:4|h|@0.5|#tag_key_1:tag_value_1,tag_key_2:tag_value_2",
+    ]
+
+
+def test_builder_cache_lru():
+    builder = protocol.Builder(namespace=None, constant_tags={}, cache_size=2)
+
+    def build(name, tags=None):
+        return builder.build(
+            name=name, value=1, type_=typedefs.MType.COUNTER, tags=tags, sample_rate=1
+        )
+
+    assert build("name_1") == b"name_1:1|c"
+    assert build("name_2") == b"name_2:1|c"
+    assert build("name_1") == b"name_1:1|c"
+    # Least recently used `name_2` is evicted
+    assert build("name_3", {"tag_key": "tag_value"}) == b"name_3:1|c|#tag_key:tag_value"
+    assert build("name_1") == b"name_1:1|c"
+    assert build("name_2") == b"name_2:1|c"
+
+    assert builder.cache_info() == protocol.CacheInfo(
+        hits=2, misses=4, maxsize=2, currsize=2
+    )
+
+
+def test_builder_cache_disabled():
+    builder = protocol.Builder(namespace=None, constant_tags={}, cache_size=0)
+
+    for _ in range(2):
+        assert (
+            builder.build(
+                name="name",
+                value=1,
+                type_=typedefs.MType.COUNTER,
+                tags=None,
+                sample_rate=1,
+            )
+            == b"name:1|c"
+        )
+
+    assert builder.cache_info() == protocol.CacheInfo(
+        hits=0, misses=2, maxsize=0, currsize=0
+    )
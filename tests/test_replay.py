@@ -0,0 +1,72 @@
+from aiodogstatsd.replay import _HEADER, ReplayBuffer
+
+
+def _packets(replay_buffer):
+    packets = []
+    while len(replay_buffer):
+        packets.append(replay_buffer.peek())
+        replay_buffer.pop()
+    return packets
+
+
+def test_push_pop():
+    replay_buffer = ReplayBuffer(max_size=1024)
+
+    assert replay_buffer.peek() is None
+    replay_buffer.push(b"first")
+    replay_buffer.push(b"second")
+
+    assert len(replay_buffer) == 2
+    assert replay_buffer.size == 4 + 5 + 4 + 6
+    assert _packets(replay_buffer) == [b"first", b"second"]
+    assert replay_buffer.size == 0
+
+
+def test_drop_oldest():
+    # Room for 3 packets of 5 bytes and their lengths
+    replay_buffer = ReplayBuffer(max_size=_HEADER.size + 3 * 9)
+
+    for packet in (b"aaaaa", b"bbbbb", b"ccccc", b"ddddd"):
+        replay_buffer.push(packet)
+    replay_buffer.push(b"x" * 28)
+
+    assert replay_buffer.dropped == 2
+    assert _packets(replay_buffer) == [b"bbbbb", b"ccccc", b"ddddd"]
+
+
+def test_wrap_around():
+    replay_buffer = ReplayBuffer(max_size=_HEADER.size + 20)
+
+    packets = [bytes([ord("a") + idx]) * (idx % 7 + 1) for idx in range(50)]
+    popped = []
+    for packet in packets:
+        replay_buffer.push(packet)
+        if len(replay_buffer) > 1:
+            popped.append(replay_buffer.peek())
+            replay_buffer.pop()
+    popped.extend(_packets(replay_buffer))
+
+    # Packets which didn't fit were dropped, the order of others is kept
+    assert popped == [packet for packet in packets if packet in popped]
+    assert len(popped) + replay_buffer.dropped == len(packets)
+
+
+def test_file(tmp_path):
+    path = str(tmp_path / "replay")
+
+    replay_buffer = ReplayBuffer(max_size=64, path=path)
+    replay_buffer.push(b"first")
+    replay_buffer.push(b"second")
+    replay_buffer.pop()
+    replay_buffer.push(b"third")
+    replay_buffer.close()
+
+    replay_buffer = ReplayBuffer(max_size=64, path=path)
+    assert _packets(replay_buffer) == [b"second", b"third"]
+    replay_buffer.push(b"fourth")
+    replay_buffer.close()
+
+    # Ring of another size is started from scratch
+    replay_buffer = ReplayBuffer(max_size=128, path=path)
+    assert len(replay_buffer) == 0
+    replay_buffer.close()
@@ -0,0 +1,44 @@
+from aiodogstatsd.sampling import AdaptiveSampler
+
+
+def test_decrease():
+    sampler = AdaptiveSampler(threshold=0.25, min_rate=0.01, interval=1.0)
+
+    sampler.observe(0.25, 0.0)
+    assert sampler.rate == 1
+
+    sampler.observe(0.3, 0.0)
+    assert sampler.rate == 0.5
+
+    # Queue is full, rate is halved twice to bring fill level under threshold
+    sampler.observe(1.0, 0.0)
+    assert sampler.rate == 0.125
+
+    sampler.observe(1.0, 0.0)
+    sampler.observe(1.0, 0.0)
+    sampler.observe(1.0, 0.0)
+    assert sampler.rate == 0.01
+
+
+def test_increase():
+    sampler = AdaptiveSampler(threshold=0.25, min_rate=0.01, interval=1.0)
+    sampler.observe(1.0, 0.0)
+    assert sampler.rate == 0.25
+
+    # Rate isn't increased until interval passed
+    sampler.observe(0.1, 0.5)
+    assert sampler.rate == 0.25
+
+    sampler.observe(0.1, 1.0)
+    assert sampler.rate == 0.5
+
+    # Doubled rate would bring fill level over threshold
+    sampler.observe(0.2, 1.5)
+    sampler.observe(0.1, 2.0)
+    assert sampler.rate == 0.5
+
+    sampler.observe(0.1, 3.0)
+    assert sampler.rate == 1
+
+    sampler.observe(0.0, 4.0)
+    assert sampler.rate == 1
@@ -0,0 +1,93 @@
+from aiodogstatsd import typedefs
+from aiodogstatsd.telemetry import Stats, Telemetry
+
+
+def test_stats():
+    telemetry = Telemetry()
+    telemetry.metrics_enqueued += 3
+    telemetry.packets_sent += 2
+    telemetry.bytes_sent += 42
+    telemetry.observe_pending_queue_size(2)
+    telemetry.observe_pending_queue_size(1)
+    telemetry.observe_send_latency(0.5)
+    telemetry.observe_send_latency(0.25)
+
+    assert telemetry.stats() == Stats(
+        metrics_enqueued=3,
+        metrics_dropped_queue_full=0,
+        metrics_dropped_send_error=0,
+        metrics_dropped_closing=0,
+        metrics_tags_collapsed=0,
+        metrics_guard_evicted=0,
+        packets_sent=2,
+        packets_dropped=0,
+        bytes_sent=42,
+        pending_queue_high_water_mark=2,
+        send_latency_max=0.5,
+        send_latency_avg=0.375,
+    )
+
+
+def test_flush():
+    telemetry = Telemetry()
+    telemetry.metrics_enqueued += 3
+    telemetry.metrics_dropped_queue_full += 1
+    telemetry.observe_pending_queue_size(2)
+    telemetry.observe_send_latency(0.5)
+
+    metrics = telemetry.flush()
+    assert metrics == [
+        ("aiodogstatsd.client.metrics_enqueued", typedefs.MType.COUNTER, 3, {}),
+        (
+            "aiodogstatsd.client.metrics_dropped",
+            typedefs.MType.COUNTER,
+            1,
+            {"reason": "queue_full"},
+        ),
+        (
+            "aiodogstatsd.client.metrics_dropped",
+            typedefs.MType.COUNTER,
+            0,
+            {"reason": "send_error"},
+        ),
+        (
+            "aiodogstatsd.client.metrics_dropped",
+            typedefs.MType.COUNTER,
+            0,
+            {"reason": "closing"},
+        ),
+        ("aiodogstatsd.client.metrics_tags_collapsed", typedefs.MType.COUNTER, 0, {}),
+        ("aiodogstatsd.client.metrics_guard_evicted", typedefs.MType.COUNTER, 0, {}),
+        ("aiodogstatsd.client.packets_sent", typedefs.MType.COUNTER, 0, {}),
+        ("aiodogstatsd.client.packets_dropped", typedefs.MType.COUNTER, 0, {}),
+        ("aiodogstatsd.client.bytes_sent", typedefs.MType.COUNTER, 0, {}),
+        (
+            "aiodogstatsd.client.pending_queue_high_water_mark",
+            typedefs.MType.GAUGE,
+            2,
+            {},
+        ),
+        ("aiodogstatsd.client.send_latency_max", typedefs.MType.GAUGE, 500.0, {}),
+    ]
+
+    # Counters are sent as deltas and gauges are reset after flush
+    telemetry.metrics_enqueued += 1
+    metrics = telemetry.flush()
+    assert metrics[0] == (
+        "aiodogstatsd.client.metrics_enqueued",
+        typedefs.MType.COUNTER,
+        1,
+        {},
+    )
+    assert metrics[-2:] == [
+        (
+            "aiodogstatsd.client.pending_queue_high_water_mark",
+            typedefs.MType.GAUGE,
+            0,
+            {},
+        ),
+        ("aiodogstatsd.client.send_latency_max", typedefs.MType.GAUGE, 0.0, {}),
+    ]
+    # Cumulative values are kept
+    assert telemetry.stats().metrics_enqueued == 4
+    assert telemetry.stats().pending_queue_high_water_mark == 2